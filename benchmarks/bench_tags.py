@@ -0,0 +1,56 @@
+"""Микробенчмарк классификатора хештегов на «живом» потоке сообщений группы.
+
+Запуск: python -m benchmarks.bench_tags
+"""
+import random
+import timeit
+from src.tags import DEFAULT_TAGS, TagClassifier, CHEAT, WORKOUT, MEAL
+
+CHATTER = [
+    "привет всем", "кто сегодня в зал?", "я опять проспала 😅", "ахахах", "ну ты даешь",
+    "скинь рецепт плиз", "завтра в 7 бегаем", "норм", "👍", "какой же сегодня дождь",
+    "посмотрите это видео https://youtu.be/dQw4w9WgXcQ", "у меня ноги болят после вчерашнего",
+]
+
+def make_corpus(size: int, tag_share: float = 0.15, seed: int = 1) -> list[str]:
+    """Примерно как в группе: в основном болтовня, иногда подпись с тегом."""
+    rnd = random.Random(seed)
+    all_tags = [tag for tags in DEFAULT_TAGS.values() for tag in tags]
+    corpus = []
+    for _ in range(size):
+        text = " ".join(rnd.choices(CHATTER, k=rnd.randint(1, 3)))
+        if rnd.random() < tag_share:
+            text += " " + rnd.choice(all_tags).upper() * rnd.randint(1, 2)
+        corpus.append(text)
+    return corpus
+
+def naive_classify(tags_by_category, text):
+    text = text.lower()
+    for category in (CHEAT, WORKOUT, MEAL):
+        if any(tag in text for tag in tags_by_category[category]): return category
+    return None
+
+def with_aliases(n: int) -> dict:
+    """Расширенные наборы: к каждой категории добавляем n алиасов."""
+    return {c: tags + [f"{tags[0]}_{i}" for i in range(n)] for c, tags in DEFAULT_TAGS.items()}
+
+def bench(corpus, tags_by_category, number=5):
+    clf = TagClassifier(tags_by_category)
+    for text in corpus:
+        assert clf.classify(text) == naive_classify(tags_by_category, text)
+    t_naive = min(timeit.repeat(lambda: [naive_classify(tags_by_category, t) for t in corpus], number=1, repeat=number))
+    t_clf = min(timeit.repeat(lambda: [clf.classify(t) for t in corpus], number=1, repeat=number))
+    per_msg = lambda t: t / len(corpus) * 1e6
+    return per_msg(t_naive), per_msg(t_clf)
+
+def main():
+    corpus = make_corpus(20_000)
+    print(f"{'тегов':>6} | {'any() мкс/сообщ':>16} | {'regex мкс/сообщ':>16}")
+    for aliases in (0, 10, 50, 200):
+        tags_by_category = with_aliases(aliases)
+        n_tags = sum(map(len, tags_by_category.values()))
+        naive, clf = bench(corpus, tags_by_category)
+        print(f"{n_tags:>6} | {naive:>16.2f} | {clf:>16.2f}")
+
+if __name__ == "__main__":
+    main()
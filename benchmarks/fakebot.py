@@ -0,0 +1,51 @@
+"""Заглушка Bot: все вызовы Telegram локальные и записываются в calls."""
+import itertools
+from types import SimpleNamespace
+
+class FakeBot:
+    def __init__(self, members: dict[int, str] | None = None, left: set[int] | None = None,
+                 unreachable: set[int] | None = None):
+        self.members = members or {}   # tg_id -> full_name
+        self.left = left or set()
+        self.unreachable = unreachable or set()  # get_chat_member для них падает, как при сбое сети
+        self.calls: list[tuple[str, dict]] = []
+        self._message_ids = itertools.count(1_000_000)
+
+    def _message(self, chat_id, photo=None):
+        message_id = next(self._message_ids)
+        # Как Telegram: у отправленного фото появляется свой file_id
+        photo = [SimpleNamespace(file_id=photo if isinstance(photo, str) else f"uploaded{message_id}")] if photo is not None else None
+        return SimpleNamespace(message_id=message_id, chat=SimpleNamespace(id=chat_id), photo=photo)
+
+    def count(self, method: str) -> int:
+        return sum(1 for name, _ in self.calls if name == method)
+
+    async def get_chat_member(self, chat_id, user_id):
+        self.calls.append(("get_chat_member", {"chat_id": chat_id, "user_id": user_id}))
+        if user_id in self.unreachable: raise TimeoutError()
+        status = "left" if user_id in self.left else "member"
+        return SimpleNamespace(status=status, user=SimpleNamespace(id=user_id, full_name=self.members.get(user_id, f"User {user_id}")))
+
+    async def _send(self, method, chat_id, payload, **kwargs):
+        self.calls.append((method, {"chat_id": chat_id, "payload": payload, **kwargs}))
+        return self._message(chat_id, photo=payload if method == "send_photo" else None)
+
+    async def send_message(self, chat_id, text, **kwargs): return await self._send("send_message", chat_id, text, **kwargs)
+    async def send_photo(self, chat_id, photo, **kwargs): return await self._send("send_photo", chat_id, photo, **kwargs)
+    async def send_video(self, chat_id, video, **kwargs): return await self._send("send_video", chat_id, video, **kwargs)
+    async def send_video_note(self, chat_id, video_note, **kwargs): return await self._send("send_video_note", chat_id, video_note, **kwargs)
+    async def send_document(self, chat_id, document, **kwargs): return await self._send("send_document", chat_id, document, **kwargs)
+
+    async def send_media_group(self, **kwargs):
+        self.calls.append(("send_media_group", kwargs))
+        return [self._message(kwargs.get("chat_id")) for _ in kwargs.get("media", [])]
+
+    async def _ok(self, method, *args, **kwargs):
+        self.calls.append((method, {"args": args, **kwargs}))
+        return True
+
+    async def delete_message(self, *args, **kwargs): return await self._ok("delete_message", **kwargs)
+    async def delete_messages(self, *args, **kwargs): return await self._ok("delete_messages", **kwargs)
+    async def edit_message_caption(self, *args, **kwargs): return await self._ok("edit_message_caption", **kwargs)
+    async def edit_message_text(self, *args, **kwargs): return await self._ok("edit_message_text", **kwargs)
+    async def edit_message_reply_markup(self, *args, **kwargs): return await self._ok("edit_message_reply_markup", **kwargs)
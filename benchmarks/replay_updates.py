@@ -0,0 +1,82 @@
+"""Прогоняет записанные апдейты через вебхук и меряет задержку ответа.
+
+Бот локально: BOT_MODE=webhook WEBHOOK_BACKGROUND=0 python -m src.main
+(WEBHOOK_BACKGROUND=0 — ответ приходит после обработчика, т.е. меряем апдейт -> обработчик).
+
+Запуск:
+    python -m benchmarks.replay_updates updates.jsonl --secret $WEBHOOK_SECRET
+    python -m benchmarks.replay_updates --synthetic 500 --chat-id -100123 --user-id 42
+Файл — JSON Lines или JSON-массив объектов Update (как их присылает Telegram).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import aiohttp
+
+def load_updates(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+def synthetic_updates(count: int, chat_id: int, user_id: int) -> list[dict]:
+    """Обычная болтовня в группе: текст без тегов от участника."""
+    now = int(time.time())
+    return [{
+        "update_id": 10_000 + i,
+        "message": {
+            "message_id": 10_000 + i, "date": now,
+            "chat": {"id": chat_id, "type": "supergroup", "title": "bench"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": f"сообщение номер {i}",
+        },
+    } for i in range(count)]
+
+async def replay(url: str, secret: str, updates: list[dict], concurrency: int) -> list[float]:
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        async def post(update):
+            async with semaphore:
+                start = time.perf_counter()
+                async with session.post(url, json=update) as resp:
+                    await resp.read()
+                    if resp.status != 200:
+                        raise RuntimeError(f"HTTP {resp.status} на update_id={update.get('update_id')}")
+                latencies.append(time.perf_counter() - start)
+        await asyncio.gather(*(post(u) for u in updates))
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="?")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--secret", default="")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--synthetic", type=int, default=0, help="сгенерировать N текстовых апдейтов")
+    parser.add_argument("--chat-id", type=int, default=-100)
+    parser.add_argument("--user-id", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.file:
+        updates = load_updates(args.file)
+    elif args.synthetic:
+        updates = synthetic_updates(args.synthetic, args.chat_id, args.user_id)
+    else:
+        parser.error("нужен файл с апдейтами или --synthetic N")
+
+    started = time.perf_counter()
+    latencies = sorted(asyncio.run(replay(args.url, args.secret, updates, args.concurrency)))
+    total = time.perf_counter() - started
+    ms = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"апдейтов: {len(latencies)}, {len(latencies) / total:.0f}/с")
+    print(f"p50 {ms(0.5):.2f} мс | p95 {ms(0.95):.2f} мс | max {latencies[-1] * 1000:.2f} мс | "
+          f"среднее {statistics.mean(latencies) * 1000:.2f} мс")
+
+if __name__ == "__main__":
+    main()
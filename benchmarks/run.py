@@ -0,0 +1,144 @@
+"""Бенчмарки горячих путей: отчеты, графики, обработка сообщений.
+
+Запуск:
+    python -m benchmarks.run                     # сравнить с baselines.json
+    python -m benchmarks.run --update-baselines  # записать текущие цифры как эталон
+    python -m benchmarks.run --threshold 2.0     # допустимое замедление (x эталона)
+
+БД — временный файл SQLite, Telegram — FakeBot (никаких сетевых вызовов).
+Код возврата 1, если что-то медленнее эталона больше чем в threshold раз.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# До импорта src: временная БД и фиктивные переменные окружения
+_tmp_dir = tempfile.mkdtemp(prefix="bench_")
+os.environ["DB_PATH"] = os.path.join(_tmp_dir, "bench.db")
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+os.environ.setdefault("ADMIN_ID", "1")
+os.environ.setdefault("GROUP_CHAT_ID", "-100")
+
+from src.config import GROUP_CHAT_ID
+from src.database import async_session, init_db
+from src.services import calculate_stats_period
+from src.charts import render_period_chart, render_chart, shutdown_chart_pool
+from src import handlers
+from benchmarks.fakebot import FakeBot
+from benchmarks.synthetic import populate
+from benchmarks.bench_tags import make_corpus
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+async def timeit_async(fn, repeat: int) -> float:
+    """Медиана в миллисекундах."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def fake_message(tg_id: int, message_id: int, caption: str | None = None, text: str | None = None):
+    user = SimpleNamespace(id=tg_id, is_bot=False, full_name=f"User {tg_id}", first_name="User")
+    async def delete(): return True
+    return SimpleNamespace(
+        from_user=user, chat=SimpleNamespace(id=GROUP_CHAT_ID), message_id=message_id,
+        caption=caption, text=text, photo=[SimpleNamespace(file_id=f"photo{message_id}")] if text is None else None,
+        video=None, video_note=None, media_group_id=None, delete=delete,
+    )
+
+async def run_benchmarks(args) -> dict[str, float]:
+    await init_db()
+    async with async_session() as session:
+        tg_ids = await populate(session, users=args.users, years=args.years)
+    bot = FakeBot()
+    now = datetime.now()
+    results = {}
+
+    # --- Отчеты ---
+    periods = {"day": now, "week": now - timedelta(days=now.weekday()), "month": now.replace(day=1),
+               "year": now - timedelta(days=365)}
+    for name, start in periods.items():
+        async def report(start=start):
+            async with async_session() as session:
+                await calculate_stats_period(session, bot, GROUP_CHAT_ID, start, now)
+        results[f"stats_{name}"] = await timeit_async(report, args.repeat)
+
+    # --- Графики ---
+    async with async_session() as session:
+        stats, _ = await calculate_stats_period(session, bot, GROUP_CHAT_ID, periods["month"], now)
+    names = list(stats)
+    penalties = [d['total_penalty'] for d in stats.values()]
+    async def render(): render_period_chart(names, penalties, "Отчет")
+    results["chart_render"] = await timeit_async(render, max(1, args.repeat // 2))
+    await render_chart(stats, "Отчет")
+    async def cached(): await render_chart(stats, "Отчет")
+    results["chart_cached"] = await timeit_async(cached, args.repeat)
+
+    # --- Сообщения (мс на одно сообщение) ---
+    captions = ["#еда", "#зал", "обед #ужин", "#читы!"]
+    counter = iter(range(10**9))
+    async def media_batch():
+        for i in range(args.messages):
+            msg = fake_message(tg_ids[i % len(tg_ids)], next(counter), caption=captions[i % len(captions)])
+            await handlers.handle_media(msg, bot)
+    results["handle_media_per_msg"] = await timeit_async(media_batch, 3) / args.messages
+
+    corpus = make_corpus(args.messages)
+    async def chatter_batch():
+        for i, text in enumerate(corpus):
+            await handlers.handle_tags(fake_message(tg_ids[i % len(tg_ids)], next(counter), text=text), bot)
+    results["handle_tags_per_msg"] = await timeit_async(chatter_batch, 3) / args.messages
+
+    shutdown_chart_pool()
+    return results
+
+def compare(results: dict, baselines: dict, threshold: float) -> bool:
+    ok = True
+    print(f"{'бенчмарк':<22} {'мс':>10} {'эталон':>10} {'x':>6}")
+    for name, value in results.items():
+        base = baselines.get(name)
+        ratio = value / base if base else None
+        flag = ""
+        if ratio and ratio > threshold:
+            flag, ok = "  ❌ РЕГРЕССИЯ", False
+        print(f"{name:<22} {value:>10.3f} {base if base else '-':>10} {f'{ratio:.2f}' if ratio else '-':>6}{flag}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--update-baselines", action="store_true")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmarks(args))
+
+    if args.update_baselines:
+        with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+            json.dump({name: round(value, 3) for name, value in results.items()}, f, indent=2)
+            f.write("\n")
+        print(f"Эталоны записаны в {BASELINES_PATH}")
+        compare(results, {}, args.threshold)
+        return
+
+    baselines = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH, encoding="utf-8") as f:
+            baselines = json.load(f)
+    if not compare(results, baselines, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Генератор синтетической истории: участники и годы сабмитов в SQLite."""
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from src.config import GROUP_CHAT_ID
+from src.database import User, Submission, PenaltyRule
+from src.penalties import DEFAULT_RULES
+from src.rollup import rebuild_daily_counts
+
+# Доли типов примерно как в группе
+TYPE_WEIGHTS = {"meal": 0.6, "workout": 0.2, "cheat": 0.1, "video_note": 0.1}
+FILE_TYPES = {"meal": "photo", "workout": "photo", "cheat": "photo", "video_note": "video_note"}
+
+async def populate(session, users: int = 10, years: float = 3, end: datetime | None = None,
+                   per_day: tuple[int, int] = (2, 7), verified_share: float = 0.9, seed: int = 0,
+                   chat_id: int = GROUP_CHAT_ID) -> list[int]:
+    """Заполняет БД (участники группы chat_id) и пересобирает daily_counts. Возвращает tg_id участников."""
+    rnd = random.Random(seed)
+    end = end or datetime.now()
+    start = end - timedelta(days=int(365 * years))
+    tg_ids = [1_000_000 + i for i in range(users)]
+
+    await session.execute(insert(User), [{"chat_id": chat_id, "tg_id": tg_id, "name": f"User {tg_id}", "role": "user"} for tg_id in tg_ids])
+    await session.execute(insert(PenaltyRule), [{"user_id": None, "label": None, **rule} for rule in DEFAULT_RULES])
+
+    types, weights = list(TYPE_WEIGHTS), list(TYPE_WEIGHTS.values())
+    rows = []
+    for user_id in range(1, users + 1):
+        day = start
+        while day <= end:
+            for _ in range(rnd.randint(*per_day)):
+                sub_type = rnd.choices(types, weights)[0]
+                rows.append({
+                    "user_id": user_id, "chat_id": chat_id, "type": sub_type, "file_id": f"file{len(rows)}",
+                    "file_type": FILE_TYPES[sub_type],
+                    "timestamp": day.replace(hour=rnd.randint(7, 23), minute=rnd.randint(0, 59)),
+                    "verified": rnd.random() < verified_share,
+                })
+            day += timedelta(days=1)
+
+    for i in range(0, len(rows), 10_000):
+        await session.execute(insert(Submission), rows[i:i + 10_000])
+    await rebuild_daily_counts(session)
+    await session.commit()
+    return tg_ids
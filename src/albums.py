@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+from aiogram.types import Message
+
+ALBUM_WINDOW = 1.0  # Сек тишины, после которой альбом считается собранным
+ALBUM_MAX = 10      # Больше в media_group Telegram не присылает
+
+def media_item(message: Message) -> dict | None:
+    """{file_id, file_type, message_id} из сообщения с фото/видео/кружком."""
+    if message.photo:
+        return {"file_id": message.photo[-1].file_id, "file_type": "photo", "message_id": message.message_id}
+    if message.video:
+        return {"file_id": message.video.file_id, "file_type": "video", "message_id": message.message_id}
+    if message.video_note:
+        return {"file_id": message.video_note.file_id, "file_type": "video_note", "message_id": message.message_id}
+    return None
+
+class AlbumBuffer:
+    """Копит сообщения одного media_group_id и отдает их пачкой.
+
+    Telegram присылает альбом отдельными апдейтами без признака «последний»,
+    поэтому ждем паузу ALBUM_WINDOW после очередного элемента (или ALBUM_MAX штук).
+    """
+
+    def __init__(self, window: float = ALBUM_WINDOW):
+        self.window = window
+        self._albums: dict[str, list[Message]] = {}
+        self._timers: dict[str, asyncio.Task] = {}
+        self._running: set[asyncio.Task] = set()  # Держим ссылки, чтобы задачи не собрал GC
+
+    async def add(self, message: Message, on_ready: Callable[[list[Message]], Awaitable[None]]):
+        key = message.media_group_id
+        album = self._albums.setdefault(key, [])
+        album.append(message)
+
+        timer = self._timers.pop(key, None)
+        if timer: timer.cancel()
+        delay = 0 if len(album) >= ALBUM_MAX else self.window
+        task = asyncio.create_task(self._flush_later(key, delay, on_ready))
+        self._timers[key] = task
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _flush_later(self, key: str, delay: float, on_ready):
+        await asyncio.sleep(delay)
+        # Дальше отмена уже не придет: таймер и альбом забираем до вызова обработчика
+        self._timers.pop(key, None)
+        messages = sorted(self._albums.pop(key, []), key=lambda m: m.message_id)
+        try:
+            await on_ready(messages)
+        except Exception:
+            logging.exception(f"Ошибка обработки альбома {key}")
+
+    def __len__(self):
+        return len(self._albums)
+
+albums = AlbumBuffer()
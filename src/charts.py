@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.metrics import CHART_SECONDS, CHART_CACHE
+
+RENDER_WORKERS = 1       # Процессов для рендера (VPS маленький)
+CHART_CACHE_SIZE = 32    # Сколько PNG держим в памяти
+
+_pool: ProcessPoolExecutor | None = None
+_cache: OrderedDict[str, bytes] = OrderedDict()
+_inflight: dict[str, asyncio.Future] = {}
+
+# --- РЕНДЕР (выполняется в отдельном процессе) ---
+def render_period_chart(names: list, penalties: list, title: str) -> bytes:
+    """Рисует график штрафов через объектный API (Figure + Agg), без глобального pyplot."""
+    from matplotlib import style
+    from matplotlib.figure import Figure
+
+    buf = io.BytesIO()
+    if not names:
+        fig = Figure(figsize=(6, 4))
+        ax = fig.subplots()
+        ax.text(0.5, 0.5, "Нет данных", ha='center')
+        fig.savefig(buf, format='png')
+        return buf.getvalue()
+
+    with style.context('bmh'):
+        fig = Figure(figsize=(8, 5))
+        ax = fig.subplots()
+        bars = ax.bar(names, penalties, color=['#4CAF50' if p==0 else '#F44336' for p in penalties], alpha=0.9)
+
+        ax.set_title(title, fontsize=14, fontweight='bold')
+        ax.set_ylabel("Штрафы", fontsize=12)
+        ax.tick_params(axis='x', labelrotation=15 if len(names) > 3 else 0)
+
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width()/2., height, f'{int(height)}',
+                    ha='center', va='bottom', fontsize=12, fontweight='bold')
+
+        fig.savefig(buf, format='png', dpi=100, bbox_inches='tight')
+    return buf.getvalue()
+
+# --- АСИНХРОННАЯ ОБЕРТКА ---
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    global _pool
+    if _pool is broken:  # Параллельный запрос мог уже поднять новый пул
+        _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+async def _run_in_pool(fn, *args):
+    """Задача в пуле рендера. Процесс пула умер (OOM и т.п.) — поднимаем новый пул и пробуем еще раз."""
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    try:
+        return await loop.run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        logging.warning("Процесс рендера графиков умер, перезапускаю пул")
+        _reset_pool(pool)
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+
+def chart_key(stats_data: dict, title: str) -> str:
+    payload = [title, [[name, d['total_penalty']] for name, d in stats_data.items()]]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode()).hexdigest()
+
+async def render_chart(stats_data: dict, title: str) -> bytes:
+    """PNG графика: из кэша, либо рендер в пуле процессов (event loop не блокируется)."""
+    key = chart_key(stats_data, title)
+    if key in _cache:
+        _cache.move_to_end(key)
+        CHART_CACHE.inc(result="hit")
+        return _cache[key]
+    CHART_CACHE.inc(result="miss")
+    if key in _inflight:  # Такой же график уже рисуется
+        return await asyncio.shield(_inflight[key])
+
+    names = list(stats_data.keys())
+    penalties = [d['total_penalty'] for d in stats_data.values()]
+    future = asyncio.ensure_future(_run_in_pool(render_period_chart, names, penalties, title))
+    _inflight[key] = future
+    try:
+        with CHART_SECONDS.time():
+            png = await future
+    finally:
+        _inflight.pop(key, None)
+
+    _cache[key] = png
+    if len(_cache) > CHART_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return png
+
+def _warm_worker():
+    # Импорт matplotlib и загрузка шрифтов в процессе пула
+    render_period_chart([], [], "")
+
+async def warm_up_chart_pool():
+    """Заранее поднимает процесс рендера, чтобы первый /stats не ждал spawn и импортов."""
+    await _run_in_pool(_warm_worker)
+
+def shutdown_chart_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
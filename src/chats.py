@@ -0,0 +1,52 @@
+import asyncio
+from aiogram import BaseMiddleware
+from src.config import GROUP_CHAT_ID, GROUP_CHAT_IDS, CHAT_CONCURRENCY
+
+def chat_scope(chat_id: int) -> int:
+    """В какой группе считаются сабмиты и отчеты: сама группа или (личка, чужой чат) — домашняя."""
+    return chat_id if chat_id in GROUP_CHAT_IDS else GROUP_CHAT_ID
+
+def auto_register(chat_id: int) -> bool:
+    # Домашняя группа — только INIT_USERS, как раньше; в остальных участник появляется с первым сабмитом
+    return chat_id != GROUP_CHAT_ID and chat_id in GROUP_CHAT_IDS
+
+def shard_of(chat_id: int | None, shards: int) -> int:
+    return (chat_id or 0) % shards
+
+class _Lane:
+    __slots__ = ("semaphore", "users")
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+class ChatLanesMiddleware(BaseMiddleware):
+    """Внешний middleware на dp.update: своя очередь на каждый чат.
+
+    В работе одновременно не больше CHAT_CONCURRENCY апдейтов одного чата, остальные ждут
+    в очереди своего чата. Тяжелый отчет в одной группе не занимает слоты других.
+    """
+
+    def __init__(self, limit: int = CHAT_CONCURRENCY):
+        self.limit = limit
+        self._lanes: dict[int, _Lane] = {}
+
+    async def __call__(self, handler, event, data):
+        chat = data.get("event_chat")
+        if chat is None:
+            return await handler(event, data)
+
+        lane = self._lanes.get(chat.id)
+        if lane is None:
+            lane = self._lanes[chat.id] = _Lane(self.limit)
+        lane.users += 1
+        try:
+            async with lane.semaphore:
+                return await handler(event, data)
+        finally:
+            lane.users -= 1
+            if not lane.users:
+                del self._lanes[chat.id]  # Личек может быть много: пустые очереди не храним
+
+    def depth(self) -> dict[int, int]:
+        return {chat_id: lane.users for chat_id, lane in self._lanes.items()}
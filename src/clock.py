@@ -0,0 +1,36 @@
+"""Время бота: все «сегодня», границы суток и ключи дней считаются в TIMEZONE, а не по часам контейнера.
+
+Сабмит хранит ts (UTC epoch, секунды) и day (локальная дата в TIMEZONE).
+Сутки в epoch — [полночь day, полночь следующего дня), поэтому дни перехода на летнее/зимнее
+время (23 и 25 часов) считаются правильно.
+"""
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+from src.config import TIMEZONE
+
+TZ = ZoneInfo(TIMEZONE)
+
+def now_local() -> datetime:
+    """Текущее время в TIMEZONE, naive (для отображения и колонки timestamp)."""
+    return datetime.now(TZ).replace(tzinfo=None)
+
+def today_local() -> date:
+    return now_local().date()
+
+def to_epoch(local: datetime) -> int:
+    """Naive локальное время TIMEZONE -> UTC epoch."""
+    return int(local.replace(tzinfo=TZ).timestamp())
+
+def from_epoch(ts: int) -> datetime:
+    """UTC epoch -> naive локальное время TIMEZONE."""
+    return datetime.fromtimestamp(ts, TZ).replace(tzinfo=None)
+
+def day_bounds(first: date, last: date) -> tuple[int, int]:
+    """Epoch-границы [начало first, начало дня после last) в TIMEZONE."""
+    start = datetime.combine(first, datetime.min.time())
+    end = datetime.combine(last + timedelta(days=1), datetime.min.time())
+    return to_epoch(start), to_epoch(end)
+
+def epoch_now() -> int:
+    return int(time.time())
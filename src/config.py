@@ -6,13 +6,41 @@ load_dotenv(env_path)
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = int(os.getenv("ADMIN_ID"))
-GROUP_CHAT_ID = int(os.getenv("GROUP_CHAT_ID"))
+GROUP_CHAT_ID = int(os.getenv("GROUP_CHAT_ID"))  # «Домашняя» группа: INIT_USERS, личка с ботом
+# Все обслуживаемые группы через запятую. В дополнительных участники регистрируются сами
+GROUP_CHAT_IDS = [int(x) for x in os.getenv("GROUP_CHAT_IDS", "").split(",") if x.strip()]
+if GROUP_CHAT_ID not in GROUP_CHAT_IDS:
+    GROUP_CHAT_IDS.insert(0, GROUP_CHAT_ID)
 TIMEZONE = os.getenv("TIMEZONE", "Europe/Kyiv")
+# Прием апдейтов: polling или webhook (можно переопределить через --mode)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")           # Публичный https://host, без пути
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")     # X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# 1 — отвечаем Telegram сразу, 0 — после обработчика (удобно мерить задержку)
+WEBHOOK_BACKGROUND = os.getenv("WEBHOOK_BACKGROUND", "1") == "1"
+
+# Метрики Prometheus (0 — выключено) и профилирование медленных апдейтов
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9091"))
+SLOW_UPDATE_MS = int(os.getenv("SLOW_UPDATE_MS", "0"))  # 0 — не профилируем
+PROFILE_EVERY = max(1, int(os.getenv("PROFILE_EVERY", "20")))  # Под cProfile идет каждый N-й апдейт
+
+# Шардирование по чатам: апдейтов одного чата одновременно в работе не больше CHAT_CONCURRENCY,
+# SHARD_WORKERS > 0 — чаты раскладываются по стольким процессам-воркерам (0 — все в одном процессе)
+CHAT_CONCURRENCY = int(os.getenv("CHAT_CONCURRENCY", "4"))
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0"))
+
+# Где ждут медиа без хештега: memory (быстро) или sqlite (переживает рестарт)
+PENDING_MEDIA_BACKEND = os.getenv("PENDING_MEDIA_BACKEND", "memory")
 
 # Пути
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MEDIA_DIR = os.path.join(BASE_DIR, "media")
-DB_PATH = os.path.join(BASE_DIR, "data", "bot.db")
+PROFILES_DIR = os.path.join(BASE_DIR, "data", "profiles")
+DB_PATH = os.getenv("DB_PATH", os.path.join(BASE_DIR, "data", "bot.db"))
 
 # Создаем папки если нет
 os.makedirs(MEDIA_DIR, exist_ok=True)
@@ -1,35 +1,162 @@
-from sqlalchemy import Column, Integer, String, BigInteger, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, BigInteger, DateTime, Date, Boolean, LargeBinary, ForeignKey, Index, UniqueConstraint, event
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
-from src.config import DB_PATH
+from src.config import DB_PATH, GROUP_CHAT_ID
+from src.clock import now_local, today_local, to_epoch, epoch_now
+from src.migrations import run_migrations
+from src.metrics import instrument_engine
 
 Base = declarative_base()
 
 class User(Base):
+    """Участник конкретной группы: один человек в двух группах — две записи."""
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True)
-    tg_id = Column(BigInteger, unique=True, nullable=False)
+    chat_id = Column(BigInteger, nullable=False, default=GROUP_CHAT_ID)
+    tg_id = Column(BigInteger, nullable=False)
     name = Column(String, nullable=False)
     role = Column(String, default="user")
 
+    __table_args__ = (UniqueConstraint('chat_id', 'tg_id', name='uq_users_chat_tg'),)
+
+def _stamp_ts(context):
+    # ts и day выводятся из timestamp, если он передан (в т.ч. при пакетной вставке)
+    local = context.get_current_parameters().get("timestamp")
+    return to_epoch(local) if local else epoch_now()
+
+def _stamp_day(context):
+    local = context.get_current_parameters().get("timestamp")
+    return local.date() if local else today_local()
+
 class Submission(Base):
     __tablename__ = 'submissions'
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
+    chat_id = Column(BigInteger)  # Группа (= users.chat_id), для выборок по чату без join
     type = Column(String)  # meal, workout, cheat
     
     # ИЗМЕНЕНИЯ ЗДЕСЬ:
     file_id = Column(String)   # Храним ID от Telegram
     file_type = Column(String) # photo, video, video_note
     
-    timestamp = Column(DateTime, default=datetime.now)
+    timestamp = Column(DateTime, default=now_local)  # Локальное время TIMEZONE, для показа
+    ts = Column(BigInteger, default=_stamp_ts)       # UTC epoch: момент сабмита
+    day = Column(Date, default=_stamp_day)           # Локальный день в TIMEZONE: ключ сводок
     verified = Column(Boolean, default=False)
+    mod_chat_id = Column(BigInteger)     # Сообщение с кнопками модерации,
+    mod_message_id = Column(BigInteger)  # чтобы /queue мог снять с него кнопки
+
+    __table_args__ = (
+        # Покрывающий для модерации по дням и пересборки daily_counts
+        Index('ix_submissions_user_day_verified', 'user_id', 'day', 'verified', 'type'),
+        # Выгрузка по периоду
+        Index('ix_submissions_ts', 'ts'),
+        # Очередь модерации: неподтвержденные по порядку, по всем чатам и в одном чате
+        Index('ix_submissions_verified_id', 'verified', 'id'),
+        Index('ix_submissions_chat_verified_id', 'chat_id', 'verified', 'id'),
+    )
+
+class SubmissionMedia(Base):
+    """Медиа сабмита: одно для обычного поста, несколько для альбома (media_group)."""
+    __tablename__ = 'submission_media'
+    id = Column(Integer, primary_key=True)
+    submission_id = Column(Integer, ForeignKey('submissions.id'), nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)  # Порядок в альбоме
+    file_id = Column(String, nullable=False)
+    file_type = Column(String, nullable=False)  # photo, video, video_note
+
+class DailyCount(Base):
+    """Сводка: подтвержденные сабмиты по (юзер, день, тип). Обновляется вместе с модерацией."""
+    __tablename__ = 'daily_counts'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    type = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class AutoDelete(Base):
+    """Очередь автоудаления сообщений бота (переживает рестарт)."""
+    __tablename__ = 'autodelete_queue'
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    message_id = Column(BigInteger, nullable=False)
+    delete_at = Column(DateTime, nullable=False, index=True)
+
+class PendingMedia(Base):
+    """Медиа без хештега, ждет текст с тегом (режим PENDING_MEDIA_BACKEND=sqlite)."""
+    __tablename__ = 'pending_media'
+    chat_id = Column(BigInteger, primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)  # Telegram ID
+    payload = Column(Text, nullable=False)          # JSON
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class FsmState(Base):
+    """Состояние FSM aiogram (SqliteStorage): переживает рестарт, брошенные истекают по TTL."""
+    __tablename__ = 'fsm_states'
+    key = Column(String, primary_key=True)  # DefaultKeyBuilder: fsm:bot:chat:user:destiny
+    state = Column(String)
+    data = Column(Text, nullable=False, default="{}")  # JSON
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class StoredReport(Base):
+    """Готовый отчет за завершенный период (ночные дайджесты). Отдается без пересчета."""
+    __tablename__ = 'stored_reports'
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    kind = Column(String, nullable=False)      # daily, weekly, monthly
+    start_day = Column(Date, nullable=False)
+    end_day = Column(Date, nullable=False)
+    title = Column(String, nullable=False)
+    text = Column(Text)          # None — "Нет данных"
+    chart = Column(LargeBinary)  # PNG графика
+    file_id = Column(String)     # Он же в Telegram, если уже отправлялся
+    created_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (UniqueConstraint('chat_id', 'start_day', 'end_day', name='uq_stored_reports_period'),)
+
+class ReportInvalidation(Base):
+    """Когда модерация последний раз меняла данные дня: отчет, посчитанный раньше, сохранять нельзя."""
+    __tablename__ = 'report_invalidations'
+    day = Column(Date, primary_key=True)
+    invalidated_at = Column(DateTime, nullable=False)
+
+class Tag(Base):
+    __tablename__ = 'tags'
+    tag = Column(String, primary_key=True)        # "#зал", всегда в нижнем регистре
+    category = Column(String, nullable=False)     # meal, workout, cheat
+
+class PenaltyRule(Base):
+    __tablename__ = 'penalty_rules'
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)  # NULL = правило по умолчанию
+    chat_id = Column(BigInteger, nullable=True)  # Для правил по умолчанию: NULL — во всех группах
+    kind = Column(String, nullable=False)    # daily_min, per_item, period_quota
+    metric = Column(String, nullable=False)  # meals, workouts, cheats
+    value = Column(Integer, nullable=False, default=1)
+    label = Column(String)  # Текст причины, если не подходит стандартный
+
+# Настройки SQLite на каждое соединение: WAL, чтобы отчеты не блокировали модерацию
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,          # мс ждать блокировку вместо "database is locked"
+    "mmap_size": 128 * 1024 * 1024,
+    "cache_size": -16000,          # ~16 МБ
+    "temp_store": "MEMORY",
+}
 
 engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}", echo=False)
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+instrument_engine(engine)
+
+@event.listens_for(engine.sync_engine, "connect")
+def apply_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
 
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(run_migrations, Base.metadata)
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""Ночные дайджесты: отчеты за завершенные периоды считаются после полуночи, а не вечером по кнопке.
+
+Для каждой группы из GROUP_CHAT_IDS. Ежедневно (00:05 по TIMEZONE): отчет за вчера, а 1-го числа — за прошлый месяц.
+По понедельникам (00:10): прошлая неделя. Все публикуются в группу и ложатся в stored_reports, откуда
+отдаются без пересчета кнопками «За вчера», «Прошлая неделя», «Прошлый месяц» (STORED_REPORT_DAYS дней).
+"""
+import logging
+from datetime import datetime, timedelta
+from aiogram import Bot
+from aiogram.types import BufferedInputFile
+from src.config import GROUP_CHAT_IDS
+from src.clock import now_local
+from src.database import async_session
+from src.services import calculate_stats_period
+from src.charts import render_chart
+from src.reports import format_report, store_report, prune_stored_reports
+from src.outbox import outbox_lane, Priority
+from src.scheduler import scheduler
+from src.handlers import deliver_report
+
+def _yesterday() -> datetime:
+    return now_local() - timedelta(days=1)
+
+async def build_digest(bot: Bot, chat_id: int, kind: str, start: datetime, end: datetime, title: str, post: bool):
+    """Считает отчет, при post публикует в группу, сохраняет в stored_reports."""
+    since = datetime.now()
+    async with async_session() as session:
+        stats, complete = await calculate_stats_period(session, bot, chat_id, start, end)
+
+    text = png = file_id = None
+    if stats:
+        text = format_report(stats, title)
+        png = await render_chart(stats, title)
+        if post:
+            with outbox_lane(Priority.BULK):
+                file_id = await deliver_report(bot, chat_id, title, text, BufferedInputFile(png, filename="stats.png"),
+                                               autodelete=False)
+    if not complete:
+        # Telegram не отдал чей-то статус: в группу ушло, но хранить неполный отчет нельзя
+        logging.warning(f"🌙 Дайджест {kind} {start:%d.%m}-{end:%d.%m} для {chat_id} не сохранен: не все статусы известны")
+        return
+    if not await store_report(chat_id, kind, start, end, title, text, png, file_id, since):
+        # Пока считали, модерация тронула дни периода: посчитаем по запросу
+        logging.info(f"🌙 Дайджест {kind} {start:%d.%m}-{end:%d.%m} для {chat_id} не сохранен: данные менялись")
+        return
+    logging.info(f"🌙 Дайджест {kind} {start:%d.%m}-{end:%d.%m} для {chat_id} готов")
+
+async def nightly_digest(bot: Bot):
+    day = _yesterday()
+    month_over = (day + timedelta(days=1)).day == 1
+    for chat_id in GROUP_CHAT_IDS:
+        await build_digest(bot, chat_id, "daily", day, day, f"Отчет за {day.strftime('%d.%m')}", post=True)
+        if month_over:
+            await build_digest(bot, chat_id, "monthly", day.replace(day=1), day, f"Отчет за {day.strftime('%B')}", post=True)
+    await prune_stored_reports(now_local().date())
+
+async def weekly_digest(bot: Bot):
+    now = now_local()
+    end = now - timedelta(days=now.weekday() + 1)  # Последняя полная неделя пн-вс, как у кнопки «Прошлая неделя»
+    start = end - timedelta(days=6)
+    for chat_id in GROUP_CHAT_IDS:
+        await build_digest(bot, chat_id, "weekly", start, end, f"Отчет за неделю {start:%d.%m}-{end:%d.%m}", post=True)
+
+def start_digests(bot: Bot):
+    scheduler.add_job(nightly_digest, 'cron', hour=0, minute=5, args=[bot], id="nightly_digest",
+                      max_instances=1, coalesce=True, misfire_grace_time=3600, replace_existing=True)
+    scheduler.add_job(weekly_digest, 'cron', day_of_week='mon', hour=0, minute=10, args=[bot], id="weekly_digest",
+                      max_instances=1, coalesce=True, misfire_grace_time=3600, replace_existing=True)
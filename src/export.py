@@ -0,0 +1,89 @@
+import csv
+import os
+import tempfile
+from datetime import datetime
+from sqlalchemy import select, and_, Boolean, Integer, Date, DateTime
+from src.database import async_session, User, Submission, DailyCount
+from src.clock import day_bounds
+
+EXPORT_CHUNK = 5000  # Строк за раз: память не зависит от размера таблицы
+EXPORT_FORMATS = ("csv", "parquet")
+EXPORT_KINDS = ("submissions", "daily")
+
+def _query(kind: str, start: datetime, end: datetime):
+    if kind == "daily":
+        columns = [DailyCount.day, User.chat_id, User.tg_id, User.name, DailyCount.type, DailyCount.count]
+        return select(*columns).join(User, User.id == DailyCount.user_id).where(
+            and_(DailyCount.day >= start.date(), DailyCount.day <= end.date())
+        ).order_by(DailyCount.day, User.chat_id, User.tg_id)
+
+    columns = [Submission.id, Submission.ts, Submission.timestamp, Submission.day, Submission.chat_id, User.tg_id, User.name,
+               Submission.type, Submission.file_type, Submission.file_id, Submission.verified]
+    ts_start, ts_end = day_bounds(start.date(), end.date())
+    return select(*columns).join(User, User.id == Submission.user_id).where(
+        and_(Submission.ts >= ts_start, Submission.ts < ts_end)
+    ).order_by(Submission.id)
+
+class _CsvWriter:
+    def __init__(self, path: str, columns: list[str]):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+def _arrow_type(sql_type):
+    import pyarrow as pa
+    if isinstance(sql_type, Boolean): return pa.bool_()
+    if isinstance(sql_type, Integer): return pa.int64()
+    if isinstance(sql_type, DateTime): return pa.timestamp("us")
+    if isinstance(sql_type, Date): return pa.date32()
+    return pa.string()
+
+class _ParquetWriter:
+    def __init__(self, path: str, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq  # Опционально: extra export (pyarrow)
+        self._pa = pa
+        # Схема из типов колонок запроса, а не из первой пачки: там колонка может быть целиком NULL
+        self._schema = pa.schema([pa.field(c.key, _arrow_type(c.type)) for c in columns])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        self._writer.write_table(self._pa.Table.from_pylist([row._asdict() for row in rows], schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+async def export_to_file(kind: str, start: datetime, end: datetime, fmt: str) -> tuple[str, int]:
+    """Потоково выгружает строки в временный файл. Возвращает (путь, кол-во строк)."""
+    fd, path = tempfile.mkstemp(prefix=f"export_{kind}_", suffix=f".{fmt}")
+    os.close(fd)
+
+    stmt = _query(kind, start, end).execution_options(yield_per=EXPORT_CHUNK)
+    columns = list(stmt.selected_columns)
+    writer = _ParquetWriter(path, columns) if fmt == "parquet" else _CsvWriter(path, [c.key for c in columns])
+    total = 0
+    try:
+        async with async_session() as session:
+            result = await session.stream(stmt)
+            async for chunk in result.partitions(EXPORT_CHUNK):
+                writer.write(chunk)
+                total += len(chunk)
+    except BaseException:
+        writer.close()
+        os.remove(path)
+        raise
+    writer.close()
+    return path, total
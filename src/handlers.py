@@ -1,33 +1,48 @@
 import os
+import asyncio
 from aiogram import Router, F, Bot
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
-from aiogram.filters import Command, StateFilter
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile, FSInputFile, ChatMemberUpdated, InputMediaPhoto, InputMediaVideo
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
+from aiogram.exceptions import TelegramBadRequest
 from datetime import datetime, timedelta
-
-from src.database import async_session, User, Submission
-from src.services import calculate_stats_period, generate_period_chart
-from src.config import GROUP_CHAT_ID
-from src.scheduler import scheduler, delete_msg_job
+from sqlalchemy import delete, update
+
+from src.database import async_session, Submission, SubmissionMedia
+from src.services import calculate_stats_period
+from src.charts import render_chart
+from src.rollup import bump_daily_count
+from src.pending import pending_media
+from src.albums import albums, media_item
+from src import tags
+from src.moderation import fetch_queue_page, resolve_user_day
+from src.export import export_to_file, parquet_available, EXPORT_FORMATS, EXPORT_KINDS
+from src.identity import identity_cache
+from src.outbox import outbox_lane, Priority
+from src.metrics import instrument_router
+from src.reports import report_cache, CachedReport, format_report, bump_data_version, load_stored_report, store_report, stored_kind, retitle, invalidate_stored_reports
+from src.config import ADMIN_ID
+from src.chats import chat_scope, auto_register
+from src.clock import now_local, today_local
+from src.scheduler import enqueue_autodelete
 from src.states import StatsState
+from src.members import members_cache, MembershipMiddleware, INACTIVE_STATUSES
 
 router = Router()
-
-pending_media = {} # {user_id: {"file_id": ..., "file_type": ...}}
-
-WORKOUT_TAGS = ["#спортзал", "#gym", "#зал", "#workout", "#треня", "#спорт"]
-MEAL_TAGS = ["#еда", "#meal", "#food", "#кушать", "#завтрак", "#обед", "#ужин"]
-CHEAT_TAGS = ["#читы", "#cheat", "#чит", "#вредное"]
+router.message.outer_middleware(MembershipMiddleware())
+instrument_router(router)
 
 # --- ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ---
 
 def get_stats_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="За сегодня", callback_data="stats_today"),
-         InlineKeyboardButton(text="За неделю", callback_data="stats_week")],
-        [InlineKeyboardButton(text="За месяц", callback_data="stats_month"),
-         InlineKeyboardButton(text="Кастом (даты)", callback_data="stats_custom")]
+         InlineKeyboardButton(text="За вчера", callback_data="stats_yesterday")],
+        [InlineKeyboardButton(text="За неделю", callback_data="stats_week"),
+         InlineKeyboardButton(text="За месяц", callback_data="stats_month")],
+        [InlineKeyboardButton(text="Прошлая неделя", callback_data="stats_last_week"),
+         InlineKeyboardButton(text="Прошлый месяц", callback_data="stats_last_month")],
+        [InlineKeyboardButton(text="Кастом (даты)", callback_data="stats_custom")]
     ])
 
 def get_mod_keyboard(submission_id):
@@ -37,47 +52,82 @@ def get_mod_keyboard(submission_id):
     ])
 
 async def schedule_autodelete(bot: Bot, chat_id: int, message_id: int, delay_sec: int = 300):
-    run_date = datetime.now() + timedelta(seconds=delay_sec)
-    scheduler.add_job(delete_msg_job, 'date', run_date=run_date, args=[bot, chat_id, message_id])
-
-async def get_user_from_db(user_id):
-    async with async_session() as session:
-        result = await session.execute(select(User).where(User.tg_id == user_id))
-        return result.scalar_one_or_none()
-
-async def process_submission(bot, user, file_id, file_type, content_type, chat_id, reply_id):
+    await enqueue_autodelete(chat_id, [message_id], delay_sec)
+
+def can_register(chat_id, from_user) -> bool:
+    """Может ли отправитель стать участником группы с первым сабмитом (не домашняя группа, не бот)."""
+    return auto_register(chat_scope(chat_id)) and not from_user.is_bot
+
+async def get_user_from_db(chat_id, from_user, register: bool = False):
+    """Участник группы, к которой относится чат (личка — домашняя группа).
+
+    register — завести участника, если можно: только когда сабмит действительно создается,
+    иначе любое фото в группе записало бы отправителя в штрафуемые.
+    """
+    scope = chat_scope(chat_id)
+    user = await identity_cache.get(scope, from_user.id)
+    if user is None and register and can_register(chat_id, from_user):
+        user = await identity_cache.register(scope, from_user.id, from_user.full_name)
+    return user
+
+async def process_submission(bot, user, media, content_type, chat_id, reply_id):
+    """media: [{file_id, file_type}, ...] — одно медиа или весь альбом, это один сабмит."""
     async with async_session() as session:
         new_sub = Submission(
             user_id=user.id, 
+            chat_id=user.chat_id,
             type=content_type, 
-            file_id=file_id,
-            file_type=file_type,
+            file_id=media[0]["file_id"],     # Обложка: первое медиа
+            file_type=media[0]["file_type"],
             verified=False, 
-            timestamp=datetime.now()
+            timestamp=now_local()  # ts и day выводятся из него (database.Submission)
         )
         session.add(new_sub)
+        await session.flush()
+        session.add_all(
+            SubmissionMedia(submission_id=new_sub.id, position=i, file_id=m["file_id"], file_type=m["file_type"])
+            for i, m in enumerate(media)
+        )
         await session.commit()
-        await session.refresh(new_sub)
         sub_id = new_sub.id
+    bump_data_version()
 
     emoji = "🍔" if content_type == "cheat" else ("🥗" if content_type == "meal" else "🏋️‍♂️")
     text_type = "ЧИТ-МИЛ (+1 штраф)" if content_type == "cheat" else content_type
     
-    caption_text = f"<b>{emoji} @{user.name} | {text_type}</b>\n🕓 <i>{datetime.now().strftime('%H:%M')}</i>"
+    caption_text = f"<b>{emoji} @{user.name} | {text_type}</b>\n🕓 <i>{now_local().strftime('%H:%M')}</i>"
     
+    file_id, file_type = media[0]["file_id"], media[0]["file_type"]
     sent_msg = None
-    if file_type == "photo":
+    if len(media) > 1:
+        # Альбом: один sendMediaGroup и одно сообщение с кнопками модерации
+        group = [(InputMediaVideo if m["file_type"] == "video" else InputMediaPhoto)(media=m["file_id"]) for m in media]
+        sent_group = await bot.send_media_group(chat_id=chat_id, media=group, reply_to_message_id=reply_id)
+        sent_msg = await bot.send_message(chat_id=chat_id, text=f"На проверку ({len(media)} шт.):\n{caption_text}", reply_to_message_id=sent_group[0].message_id, reply_markup=get_mod_keyboard(sub_id), parse_mode="HTML")
+        await remember_mod_message(sub_id, sent_msg)
+        await enqueue_autodelete(chat_id, [m.message_id for m in sent_group] + [sent_msg.message_id])
+        return
+    elif file_type == "photo":
         sent_msg = await bot.send_photo(chat_id=chat_id, photo=file_id, caption=f"На проверку:\n{caption_text}", reply_to_message_id=reply_id, reply_markup=get_mod_keyboard(sub_id), parse_mode="HTML")
     elif file_type == "video":
         sent_msg = await bot.send_video(chat_id=chat_id, video=file_id, caption=f"На проверку:\n{caption_text}", reply_to_message_id=reply_id, reply_markup=get_mod_keyboard(sub_id), parse_mode="HTML")
     elif file_type == "video_note":
         msg_note = await bot.send_video_note(chat_id=chat_id, video_note=file_id, reply_to_message_id=reply_id)
         sent_msg = await bot.send_message(chat_id=chat_id, text=f"На проверку:\n{caption_text}", reply_to_message_id=msg_note.message_id, reply_markup=get_mod_keyboard(sub_id), parse_mode="HTML")
-        await schedule_autodelete(bot, chat_id, msg_note.message_id)
+        await remember_mod_message(sub_id, sent_msg)
+        await enqueue_autodelete(chat_id, [msg_note.message_id, sent_msg.message_id])
+        return
 
     if sent_msg:
+        await remember_mod_message(sub_id, sent_msg)
         await schedule_autodelete(bot, chat_id, sent_msg.message_id)
 
+async def remember_mod_message(sub_id, sent_msg):
+    async with async_session() as session:
+        await session.execute(update(Submission).where(Submission.id == sub_id)
+                              .values(mod_chat_id=sent_msg.chat.id, mod_message_id=sent_msg.message_id))
+        await session.commit()
+
 # --- КОМАНДЫ ---
 
 @router.message(Command("start"))
@@ -100,67 +150,189 @@ async def cmd_stats(message: Message, bot: Bot):
     msg = await message.answer("📊 <b>Выберите период статистики:</b>", reply_markup=get_stats_keyboard(), parse_mode="HTML")
     await schedule_autodelete(bot, message.chat.id, msg.message_id)
 
+# --- ТЕГИ (ТОЛЬКО АДМИН) ---
+
+@router.message(Command("tags"), F.from_user.id == ADMIN_ID)
+async def cmd_tags(message: Message, bot: Bot):
+    by_category = {}
+    for tag, category in sorted(tags.classifier.tags.items()):
+        by_category.setdefault(category, []).append(tag)
+    lines = [f"<b>{category}</b>: {' '.join(by_category.get(category, []))}" for category in tags.CATEGORY_PRIORITY]
+    msg = await message.answer("🏷 <b>Теги:</b>\n" + "\n".join(lines) +
+                               "\n\n<code>/addtag meal #тег</code> | <code>/deltag #тег</code>", parse_mode="HTML")
+    await schedule_autodelete(bot, message.chat.id, msg.message_id)
+
+@router.message(Command("addtag"), F.from_user.id == ADMIN_ID)
+async def cmd_addtag(message: Message, command: CommandObject, bot: Bot):
+    parts = (command.args or "").split()
+    if len(parts) != 2:
+        text = "⚠️ Формат: /addtag meal #тег"
+    else:
+        category, tag = parts
+        try:
+            await tags.add_tag(tag, category)
+            text = f"✅ {tags.normalize_tag(tag)} → {category}"
+        except ValueError as e:
+            text = f"⚠️ {e}"
+    msg = await message.answer(text)
+    await schedule_autodelete(bot, message.chat.id, msg.message_id)
+
+@router.message(Command("deltag"), F.from_user.id == ADMIN_ID)
+async def cmd_deltag(message: Message, command: CommandObject, bot: Bot):
+    try:
+        removed = await tags.remove_tag(command.args or "")
+        text = "🗑 Удалено" if removed else "Такого тега нет"
+    except ValueError as e:
+        text = f"⚠️ {e}"
+    msg = await message.answer(text)
+    await schedule_autodelete(bot, message.chat.id, msg.message_id)
+
+# --- ЭКСПОРТ (ТОЛЬКО АДМИН) ---
+
+@router.message(Command("export"), F.from_user.id == ADMIN_ID)
+async def cmd_export(message: Message, command: CommandObject, bot: Bot):
+    """/export [submissions|daily] ДД.ММ.ГГГГ-ДД.ММ.ГГГГ [csv|parquet]"""
+    kind, fmt, period = "submissions", "csv", None
+    for arg in (command.args or "").split():
+        if arg in EXPORT_KINDS: kind = arg
+        elif arg in EXPORT_FORMATS: fmt = arg
+        else: period = arg
+
+    try:
+        d1_str, d2_str = period.split("-")
+        d1 = datetime.strptime(d1_str, "%d.%m.%Y")
+        d2 = datetime.strptime(d2_str, "%d.%m.%Y")
+    except (AttributeError, ValueError):
+        msg = await message.answer("⚠️ Формат: /export [submissions|daily] 01.01.2024-31.01.2024 [csv|parquet]")
+        await schedule_autodelete(bot, message.chat.id, msg.message_id)
+        return
+
+    if fmt == "parquet" and not parquet_available():
+        msg = await message.answer("⚠️ Для parquet нужен pyarrow. Используйте csv.")
+        await schedule_autodelete(bot, message.chat.id, msg.message_id)
+        return
+
+    path, rows = await export_to_file(kind, d1, d2, fmt)
+    try:
+        with outbox_lane(Priority.BULK):
+            await bot.send_document(
+                message.chat.id,
+                FSInputFile(path, filename=f"{kind}_{d1:%Y%m%d}-{d2:%Y%m%d}.{fmt}"),
+                caption=f"📦 {kind}: {d1_str} - {d2_str}, строк: {rows}",
+            )
+    finally:
+        os.remove(path)
+
 # --- CALLBACKS ДЛЯ СТАТИСТИКИ (С ФИКСОМ ДЛИННОГО ТЕКСТА) ---
 
 async def send_stats_report(bot, chat_id, start_date, end_date, title):
+    # Отчеты — массовые сообщения: пропускают вперед модерацию
+    with outbox_lane(Priority.BULK):
+        await _send_stats_report(bot, chat_id, start_date, end_date, title)
+
+async def _send_stats_report(bot, chat_id, start_date, end_date, title):
+    key = report_cache.key(chat_id, start_date, end_date, title)
+    cached = report_cache.get(key)
+    if cached:
+        # Данные не менялись: тот же текст и уже загруженный график по file_id
+        await deliver_report(bot, chat_id, title, cached.text, cached.file_id)
+        return
+
+    scope = chat_scope(chat_id)
+    # Завершенный период дайджеста: ночной дайджест или прошлый запрос могли уже посчитать его (src/digests.py)
+    kind = stored_kind(start_date, end_date) if end_date.date() < today_local() else None
+    if kind:
+        stored = await load_stored_report(scope, start_date, end_date)
+        if stored:
+            text = retitle(stored.text, title)
+            photo = stored.file_id or (BufferedInputFile(stored.chart, filename="stats.png") if stored.chart else None)
+            file_id = await deliver_report(bot, chat_id, title, text, photo)
+            report_cache.put(key, CachedReport(text, file_id))
+            return
+
+    since = datetime.now()
     loading_msg = await bot.send_message(chat_id, "🔄 Считаю статистику...")
     async with async_session() as session:
-        stats = await calculate_stats_period(session, bot, GROUP_CHAT_ID, start_date, end_date)
-        chart_buf = generate_period_chart(stats, title)
+        stats, complete = await calculate_stats_period(session, bot, scope, start_date, end_date)
     await bot.delete_message(chat_id, loading_msg.message_id)
 
-    if not stats:
+    full_text = png = file_id = None
+    if stats:
+        full_text = format_report(stats, title)
+        png = await render_chart(stats, title)
+        file_id = await deliver_report(bot, chat_id, title, full_text, BufferedInputFile(png, filename="stats.png"))
+    else:
+        await deliver_report(bot, chat_id, title, None, None)
+    if not complete: return  # Статус кого-то не узнали: отчет показали, но не запоминаем
+    report_cache.put(key, CachedReport(full_text, file_id))
+    if kind:
+        await store_report(scope, kind, start_date, end_date, title, full_text, png, file_id, since)
+
+async def deliver_report(bot, chat_id, title, full_text, photo, autodelete=True):
+    """Шлет отчет (photo — файл или file_id). Возвращает file_id графика в Telegram."""
+    if full_text is None:
         msg = await bot.send_message(chat_id, "Нет данных.")
         await schedule_autodelete(bot, chat_id, msg.message_id)
-        return
-
-    text_lines = [f"📅 <b>{title}</b>\n"]
-    for name, data in stats.items():
-        reasons_display = data['reasons']
-        line = (f"👤 <b>{name}</b>:\n"
-                f"   🥗 Еда: <b>{data['total_meals']}</b> | 🏋️‍♂️ Зал: <b>{data['total_workouts']}</b>\n"
-                f"   ⚠️ Штрафы: <b>{data['total_penalty']}</b>{data['note']}\n"
-                f"   📝 <i>Причины:</i> {reasons_display}")
-        text_lines.append(line)
-    
-    full_text = "\n\n".join(text_lines)
-    photo = BufferedInputFile(chart_buf.read(), filename="stats.png")
+        return None
 
     # --- ФИКС ОШИБКИ "CAPTION TOO LONG" ---
     if len(full_text) > 1000:
         # Если текст длинный, отправляем график отдельно, текст отдельно
         msg_photo = await bot.send_photo(chat_id=chat_id, photo=photo, caption=f"📅 <b>{title}</b> (Подробности ниже)", parse_mode="HTML")
-        await schedule_autodelete(bot, chat_id, msg_photo.message_id)
         
         # Текст (здесь лимит 4096 символов, точно влезет)
         msg_text = await bot.send_message(chat_id=chat_id, text=full_text, parse_mode="HTML")
-        await schedule_autodelete(bot, chat_id, msg_text.message_id)
+        if autodelete:
+            await enqueue_autodelete(chat_id, [msg_photo.message_id, msg_text.message_id])
     else:
         # Если текст короткий, шлем как раньше (картинка + подпись)
-        msg = await bot.send_photo(chat_id=chat_id, photo=photo, caption=full_text, parse_mode="HTML")
-        await schedule_autodelete(bot, chat_id, msg.message_id)
+        msg_photo = await bot.send_photo(chat_id=chat_id, photo=photo, caption=full_text, parse_mode="HTML")
+        if autodelete:
+            await schedule_autodelete(bot, chat_id, msg_photo.message_id)
+    return msg_photo.photo[-1].file_id if msg_photo.photo else None
 
 
 @router.callback_query(F.data == "stats_today")
 async def stats_today(call: CallbackQuery, bot: Bot):
-    now = datetime.now()
+    now = now_local()
     await call.message.delete()
     await send_stats_report(bot, call.message.chat.id, now, now, f"Отчет за {now.strftime('%d.%m')}")
 
+@router.callback_query(F.data == "stats_yesterday")
+async def stats_yesterday(call: CallbackQuery, bot: Bot):
+    day = now_local() - timedelta(days=1)
+    await call.message.delete()
+    await send_stats_report(bot, call.message.chat.id, day, day, f"Отчет за {day.strftime('%d.%m')}")
+
 @router.callback_query(F.data == "stats_week")
 async def stats_week(call: CallbackQuery, bot: Bot):
-    now = datetime.now()
+    now = now_local()
     start = now - timedelta(days=now.weekday())
     await call.message.delete()
     await send_stats_report(bot, call.message.chat.id, start, now, "Отчет за неделю")
 
 @router.callback_query(F.data == "stats_month")
 async def stats_month(call: CallbackQuery, bot: Bot):
-    now = datetime.now()
+    now = now_local()
     start = now.replace(day=1)
     await call.message.delete()
     await send_stats_report(bot, call.message.chat.id, start, now, f"Отчет за {now.strftime('%B')}")
 
+@router.callback_query(F.data == "stats_last_week")
+async def stats_last_week(call: CallbackQuery, bot: Bot):
+    now = now_local()
+    end = now - timedelta(days=now.weekday() + 1)  # Прошлое воскресенье
+    start = end - timedelta(days=6)
+    await call.message.delete()
+    await send_stats_report(bot, call.message.chat.id, start, end, f"Отчет за неделю {start:%d.%m}-{end:%d.%m}")
+
+@router.callback_query(F.data == "stats_last_month")
+async def stats_last_month(call: CallbackQuery, bot: Bot):
+    end = now_local().replace(day=1) - timedelta(days=1)
+    start = end.replace(day=1)
+    await call.message.delete()
+    await send_stats_report(bot, call.message.chat.id, start, end, f"Отчет за {end.strftime('%B')}")
+
 @router.callback_query(F.data == "stats_custom")
 async def stats_custom(call: CallbackQuery, state: FSMContext):
     await call.message.edit_text("📅 Формат: <code>ДД.ММ.ГГГГ - ДД.ММ.ГГГГ</code>", parse_mode="HTML")
@@ -188,58 +360,111 @@ async def process_custom_dates(message: Message, state: FSMContext, bot: Bot):
 
 @router.message(F.photo | F.video | F.video_note)
 async def handle_media(message: Message, bot: Bot):
-    user = await get_user_from_db(message.from_user.id)
-    if not user: return
-
-    caption = (message.caption or "").lower()
-    content_type = None
-
-    if any(tag in caption for tag in CHEAT_TAGS): content_type = "cheat"
-    elif any(tag in caption for tag in WORKOUT_TAGS): content_type = "workout"
-    elif any(tag in caption for tag in MEAL_TAGS): content_type = "meal"
-
-    if message.photo:
-        f_id = message.photo[-1].file_id
-        f_type = "photo"
-    elif message.video:
-        f_id = message.video.file_id
-        f_type = "video"
-    elif message.video_note:
-        f_id = message.video_note.file_id
-        f_type = "video_note"
+    user = await get_user_from_db(message.chat.id, message.from_user)
+    if not user and not can_register(message.chat.id, message.from_user): return
+
+    if message.media_group_id:
+        # Части альбома приходят отдельными апдейтами — собираем их в один сабмит
+        await albums.add(message, lambda messages: submit_media(bot, user, messages))
+        return
+    await submit_media(bot, user, [message])
+
+async def submit_media(bot: Bot, user, messages: list[Message]):
+    """user — None, если отправитель еще не участник: заводим его, только если подпись дала категорию."""
+    # Подпись у альбома обычно только на одном элементе
+    content_type = tags.classify(" ".join(m.caption for m in messages if m.caption))
+    media = [media_item(m) for m in messages]
+    first = messages[0]
 
     if content_type:
-        await process_submission(bot, user, f_id, f_type, content_type, message.chat.id, message.message_id)
+        user = user or await get_user_from_db(first.chat.id, first.from_user, register=True)
+        await process_submission(bot, user, media, content_type, first.chat.id, first.message_id)
     else:
-        pending_media[message.from_user.id] = {
-            "file_id": f_id, "file_type": f_type,
-            "message_id": message.message_id, "timestamp": datetime.now()
-        }
+        await pending_media.put(first.chat.id, first.from_user.id, {"media": media, "message_id": first.message_id})
 
 @router.message(F.text)
 async def handle_tags(message: Message, bot: Bot):
-    text = message.text.lower()
-    is_cheat = any(tag in text for tag in CHEAT_TAGS)
-    is_workout = any(tag in text for tag in WORKOUT_TAGS)
-    is_meal = any(tag in text for tag in MEAL_TAGS)
-
-    if not (is_workout or is_meal or is_cheat): return
+    c_type = tags.classify(message.text)
+    if not c_type: return
 
     user_id = message.from_user.id
-    last_media = pending_media.get(user_id)
+    last_media = await pending_media.pop(message.chat.id, user_id) # Просроченные (старше 5 минут) не возвращаются
     
-    if last_media and (datetime.now() - last_media["timestamp"] < timedelta(minutes=5)):
-        user = await get_user_from_db(user_id)
-        c_type = "cheat" if is_cheat else ("workout" if is_workout else "meal")
+    if last_media:
+        user = await get_user_from_db(message.chat.id, message.from_user, register=True)
+        if not user: return
+        media = last_media.get("media") or [last_media]  # Старый формат: одно медиа без списка
         
-        await process_submission(bot, user, last_media["file_id"], last_media["file_type"], c_type, message.chat.id, last_media["message_id"])
-        del pending_media[user_id]
+        await process_submission(bot, user, media, c_type, message.chat.id, last_media["message_id"])
         
         try: await message.delete()
         except: pass
 
+# --- УЧАСТНИКИ ---
+
+@router.chat_member()
+async def on_chat_member(event: ChatMemberUpdated):
+    member = event.new_chat_member
+    members_cache.update(event.chat.id, member.user.id, member.status not in INACTIVE_STATUSES, member.user.full_name)
+    bump_data_version() # Состав/имена влияют на отчет
+
 # --- МОДЕРАЦИЯ ---
 
+async def render_queue(chat_id: int, after_id: int = 0):
+    async with async_session() as session:
+        rows, has_more = await fetch_queue_page(session, chat_scope(chat_id), after_id)
+    if not rows:
+        return "✅ Очередь модерации пуста", None
+
+    lines = [f"<code>#{r.id}</code> {r.name} · {r.timestamp:%d.%m %H:%M} · {r.type}" for r in rows]
+    groups = dict.fromkeys((r.user_id, r.name, r.day) for r in rows)  # Уникальные, по порядку
+    keyboard = [
+        [InlineKeyboardButton(text=f"✅ {name} {day:%d.%m}", callback_data=f"qok_{user_id}_{day:%Y%m%d}"),
+         InlineKeyboardButton(text="❌", callback_data=f"qno_{user_id}_{day:%Y%m%d}")]
+        for user_id, name, day in groups
+    ]
+    nav = [InlineKeyboardButton(text="⏮ В начало", callback_data="queue_0")] if after_id else []
+    if has_more:
+        nav.append(InlineKeyboardButton(text="Далее ▶", callback_data=f"queue_{rows[-1].id}"))
+    if nav: keyboard.append(nav)
+
+    text = "📋 <b>На проверке</b> (кнопки — все сабмиты юзера за день):\n" + "\n".join(lines)
+    return text, InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+@router.message(Command("queue"), F.from_user.id == ADMIN_ID)
+async def cmd_queue(message: Message, bot: Bot):
+    text, keyboard = await render_queue(message.chat.id)
+    msg = await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    await schedule_autodelete(bot, message.chat.id, msg.message_id)
+
+@router.callback_query(F.data.startswith("queue_"), F.from_user.id == ADMIN_ID)
+async def queue_page(callback: CallbackQuery):
+    await refresh_queue(callback.message, int(callback.data.split("_")[1]))
+    await callback.answer()
+
+async def refresh_queue(message: Message, after_id: int = 0):
+    text, keyboard = await render_queue(message.chat.id, after_id)
+    try: await message.edit_text(text=text, reply_markup=keyboard, parse_mode="HTML")
+    except TelegramBadRequest: pass  # "message is not modified"
+
+@router.callback_query(F.data.startswith("qok_") | F.data.startswith("qno_"), F.from_user.id == ADMIN_ID)
+async def queue_resolve(callback: CallbackQuery, bot: Bot):
+    action, user_id, day = callback.data.split("_")
+    approve = action == "qok"
+    async with async_session() as session:
+        mod_messages = await resolve_user_day(session, int(user_id), datetime.strptime(day, "%Y%m%d").date(), approve)
+        await session.commit()
+    if mod_messages: bump_data_version()
+
+    await callback.answer(f"{'✅ Принято' if approve else '❌ Отклонено'}: {len(mod_messages)}")
+    await refresh_queue(callback.message)
+
+    # Снимаем кнопки с исходных постов; outbox схлопывает правки одного сообщения
+    async def drop_keyboard(chat_id, message_id):
+        try: await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=None)
+        except TelegramBadRequest: pass  # Уже удалено автоудалением
+    await asyncio.gather(*(drop_keyboard(chat_id, message_id) for chat_id, message_id in mod_messages if message_id))
+
 @router.callback_query(F.data.startswith("approve_"))
 async def approve(callback: CallbackQuery):
     sub_id = int(callback.data.split("_")[1])
@@ -247,8 +472,12 @@ async def approve(callback: CallbackQuery):
     async with async_session() as session:
         sub = await session.get(Submission, sub_id)
         if sub:
-            sub.verified = True
+            if not sub.verified:
+                sub.verified = True
+                await bump_daily_count(session, sub, +1)
+                await invalidate_stored_reports(session, sub.day)
             await session.commit()
+            bump_data_version()
             
             original = callback.message.caption or callback.message.text
             if "\n" in original: original = original.split("\n")[1] 
@@ -268,8 +497,13 @@ async def reject(callback: CallbackQuery):
     async with async_session() as session:
         sub = await session.get(Submission, sub_id)
         if sub:
+            if sub.verified:
+                await bump_daily_count(session, sub, -1)
+                await invalidate_stored_reports(session, sub.day)
+            await session.execute(delete(SubmissionMedia).where(SubmissionMedia.submission_id == sub.id))
             await session.delete(sub)
             await session.commit()
+            bump_data_version()
             
             original = callback.message.caption or callback.message.text
             if "\n" in original: original = original.split("\n")[1]
@@ -0,0 +1,77 @@
+import time
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.database import async_session, User
+
+NEGATIVE_TTL = 10 * 60   # Не-участников помним 10 минут
+NEGATIVE_MAX = 10_000    # Потолок для «чужих» ID
+
+class IdentityCache:
+    """(chat_id, tg_id) -> User (или None для не-участников) перед запросом в users.
+
+    Участники живут в кэше до явной инвалидации (добавление, смена имени),
+    не-участники — NEGATIVE_TTL секунд. При SHARD_WORKERS инвалидация в любом процессе
+    сбрасывает кэши всех процессов (общий счетчик, см. share).
+    """
+
+    def __init__(self, negative_ttl: float = NEGATIVE_TTL, negative_max: int = NEGATIVE_MAX):
+        self.negative_ttl = negative_ttl
+        self.negative_max = negative_max
+        self._users: dict[tuple[int, int], User] = {}
+        self._missing: dict[tuple[int, int], float] = {}  # (chat_id, tg_id) -> когда истекает
+        self._epoch = None  # multiprocessing.Value: растет при инвалидации в любом процессе
+        self._seen_epoch = 0
+
+    def share(self, epoch):
+        self._epoch = epoch
+        self._seen_epoch = epoch.value
+
+    async def get(self, chat_id: int, tg_id: int):
+        if self._epoch is not None and self._epoch.value != self._seen_epoch:
+            # Другой процесс что-то поменял (имя, состав): переспрашиваем БД
+            self._seen_epoch = self._epoch.value
+            self._users.clear()
+            self._missing.clear()
+        key = (chat_id, tg_id)
+        if key in self._users:
+            return self._users[key]
+        expires_at = self._missing.get(key)
+        if expires_at and expires_at > time.monotonic():
+            return None
+
+        async with async_session() as session:
+            result = await session.execute(select(User).where(User.chat_id == chat_id, User.tg_id == tg_id))
+            user = result.scalar_one_or_none()
+
+        if user:
+            self._users[key] = user
+            self._missing.pop(key, None)
+        else:
+            if len(self._missing) >= self.negative_max:
+                self._missing.clear()
+            self._missing[key] = time.monotonic() + self.negative_ttl
+        return user
+
+    async def register(self, chat_id: int, tg_id: int, name: str):
+        """Добавляет участника группы (если его еще нет) и возвращает его."""
+        async with async_session() as session:
+            await session.execute(sqlite_insert(User).values(chat_id=chat_id, tg_id=tg_id, name=name, role="user")
+                                  .on_conflict_do_nothing(index_elements=[User.chat_id, User.tg_id]))
+            await session.commit()
+        self.invalidate(chat_id, tg_id)
+        return await self.get(chat_id, tg_id)
+
+    def invalidate(self, chat_id: int | None = None, tg_id: int | None = None):
+        """Сбросить одного юзера или (без аргументов) весь кэш."""
+        if self._epoch is not None:
+            with self._epoch.get_lock():
+                self._epoch.value += 1
+            self._seen_epoch = self._epoch.value  # Свой кэш сбрасываем точечно, ниже
+        if tg_id is None:
+            self._users.clear()
+            self._missing.clear()
+        else:
+            self._users.pop((chat_id, tg_id), None)
+            self._missing.pop((chat_id, tg_id), None)
+
+identity_cache = IdentityCache()
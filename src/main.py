@@ -1,58 +1,209 @@
+import time
+STARTED_AT = time.perf_counter()  # До тяжелых импортов: отсчет для времени до первого апдейта
+
+import argparse
 import asyncio
 import logging
+from aiohttp import web
 from aiogram import Bot, Dispatcher
-from src.config import BOT_TOKEN
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from src.config import (BOT_TOKEN, GROUP_CHAT_ID, BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+                        WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_BACKGROUND, METRICS_HOST, METRICS_PORT, SHARD_WORKERS)
 from src.handlers import router
-from src.database import init_db, async_session, User
+from src.database import init_db, async_session, User, PenaltyRule
 from src.scheduler import start_scheduler
+from src.digests import start_digests
+from src.charts import shutdown_chart_pool, warm_up_chart_pool
+from src.rollup import ensure_daily_counts
+from src.tags import seed_tags, reload_classifier
+from src.identity import identity_cache
+from src.storage import fsm_storage
+from src.chats import ChatLanesMiddleware
+from src.shards import ShardPool
+from src.outbox import OutboxMiddleware, outbox, render_outbox_metrics
+from src.metrics import TelegramMetricsMiddleware, StartupMiddleware, register_collector, start_metrics_server
+from src.penalties import DAILY_MIN, PER_ITEM, PERIOD_QUOTA, DEFAULT_RULES
 from sqlalchemy import select
 
 logging.basicConfig(level=logging.INFO)
 
-# Список ТОЛЬКО для первоначальной инициализации. 
+startup = StartupMiddleware(STARTED_AT)
+_background = set()  # Ссылки на фоновые задачи, чтобы их не собрал GC
+
+# Список ТОЛЬКО для первоначальной инициализации (участники домашней группы GROUP_CHAT_ID). 
 # Имена здесь не важны, они обновятся сами. Важны ID.
+# Правила штрафов создаются один раз; дальше их правят прямо в таблице penalty_rules.
 INIT_USERS = [
-    {"tg_id": 432998089, "name": "Nikita_Init"}, # Замени на свои реальные ID
-    {"tg_id": 818400806, "name": "Dania_Init"},
-    {"tg_id": 510679050, "name": "Nyuta_Init"},
+    {"tg_id": 432998089, "name": "Nikita_Init", "rules": [ # Замени на свои реальные ID
+        {"kind": DAILY_MIN, "metric": "meals", "value": 1},
+        {"kind": PER_ITEM, "metric": "cheats", "value": 1},
+    ]},
+    {"tg_id": 818400806, "name": "Dania_Init", "rules": [
+        {"kind": DAILY_MIN, "metric": "meals", "value": 1},
+        {"kind": DAILY_MIN, "metric": "workouts", "value": 1, "label": "Пропуск зала"},
+        {"kind": PER_ITEM, "metric": "cheats", "value": 1},
+    ]},
+    {"tg_id": 510679050, "name": "Nyuta_Init", "rules": [
+        {"kind": DAILY_MIN, "metric": "meals", "value": 3, "label": "Мало еды ({count}/{value})"},
+        # Зал: 12 - 4 = 8 тренировок за период
+        {"kind": PERIOD_QUOTA, "metric": "workouts", "value": 8, "label": "Зал (Месяц): Осталось сходить {missing} раз(а)"},
+    ]},
 ]
 
 async def seed_users():
     """Добавляет пользователей в БД, если их там нет. НЕ перезаписывает имена."""
     async with async_session() as session:
         for user_data in INIT_USERS:
-            result = await session.execute(select(User).where(User.tg_id == user_data["tg_id"]))
+            result = await session.execute(select(User).where(User.chat_id == GROUP_CHAT_ID, User.tg_id == user_data["tg_id"]))
             user = result.scalar_one_or_none()
 
             if not user:
                 print(f"➕ Добавляю нового пользователя ID {user_data['tg_id']}")
                 new_user = User(
+                    chat_id=GROUP_CHAT_ID,
                     tg_id=user_data["tg_id"],
                     name=user_data["name"], # Временное имя, обновится при /stats
                     role="user"
                 )
                 session.add(new_user)
         await session.commit()
+    identity_cache.invalidate() # Новые участники не должны висеть в кэше как «чужие»
+
+async def seed_rules():
+    """Создает правила штрафов, если их еще нет. Существующие НЕ трогает."""
+    async with async_session() as session:
+        rules = (await session.execute(select(PenaltyRule))).scalars().all()
+        users_with_rules = {r.user_id for r in rules}
+
+        if None not in users_with_rules:
+            for rule in DEFAULT_RULES:
+                session.add(PenaltyRule(user_id=None, **rule))
+
+        for user_data in INIT_USERS:
+            result = await session.execute(select(User).where(User.chat_id == GROUP_CHAT_ID, User.tg_id == user_data["tg_id"]))
+            user = result.scalar_one_or_none()
+            if user and user.id not in users_with_rules:
+                for rule in user_data.get("rules", []):
+                    session.add(PenaltyRule(user_id=user.id, **rule))
+        await session.commit()
+
+# --- ПРОГРЕВ ---
+def _import_report_stack():
+    import numpy, pandas  # noqa: F401
+
+async def warm_up():
+    """Фоном после старта: pandas/numpy и процесс рендера графиков, чтобы первый /stats не ждал."""
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(_import_report_stack)
+        await warm_up_chart_pool()
+    except Exception:
+        logging.exception("Прогрев не удался: отчеты догрузят все при первом запросе")
+        return
+    logging.info(f"🔥 Прогрев отчетов занял {(time.perf_counter() - start) * 1000:.0f} мс")
 
-async def on_startup(bot: Bot):
+async def on_startup(bot: Bot, shards: ShardPool | None = None):
     await init_db()
     await seed_users() # Запускаем только добавление новых
-    start_scheduler(bot)
+    await seed_rules()
+    await ensure_daily_counts()
+    await seed_tags()
+    await reload_classifier()
+    if shards: shards.start() # Воркеры стартуют на уже мигрированной БД
+    start_scheduler(bot, local_jobs=not shards)
+    start_digests(bot) # Ночные отчеты за вчера/неделю/месяц
+    if METRICS_PORT:
+        register_collector(render_outbox_metrics)
+        await start_metrics_server(METRICS_HOST, METRICS_PORT)
+    task = asyncio.create_task(warm_up())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    startup.mark_ready()
 
-async def main():
+def create_bot() -> Bot:
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher()
+    bot.session.middleware(OutboxMiddleware()) # Все исходящие запросы — через очередь с лимитами
+    bot.session.middleware(TelegramMetricsMiddleware()) # Внутри очереди: меряем только сам вызов API
+    return bot
+
+def create_dispatcher(shards: ShardPool | None = None) -> Dispatcher:
+    # Состояния FSM переживают рестарт. При шардах главный процесс только пересылает: FSM читают воркеры
+    dp = Dispatcher(storage=fsm_storage, disable_fsm=bool(shards))
+    dp.update.outer_middleware(startup)
+    if shards:
+        dp.update.outer_middleware(shards.router) # Апдейты обрабатывают воркеры
+    else:
+        dp.update.outer_middleware(ChatLanesMiddleware()) # Своя очередь на каждый чат
     dp.include_router(router)
-    await on_startup(bot)
+    return dp
+
+def create_shards() -> ShardPool | None:
+    return ShardPool(SHARD_WORKERS) if SHARD_WORKERS > 0 else None
+
+# --- POLLING ---
+async def main():
+    bot = create_bot()
+    shards = create_shards()
+    dp = create_dispatcher(shards)
+    await on_startup(bot, shards)
     try:
-        await dp.start_polling(bot)
+        await bot.delete_webhook() # Если раньше работали через вебхук
+        # chat_member нужен кэшу участников (бот должен быть админом группы)
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     except Exception as e:
         print(f"Ошибка: {e}")
     finally:
+        if shards: shards.stop()
+        shutdown_chart_pool()
         await bot.session.close()
 
+# --- WEBHOOK ---
+async def healthz(request: web.Request):
+    return web.json_response({"status": "ok", "outbox": outbox.depth()})
+
+def create_webhook_app(bot: Bot, dp: Dispatcher, shards: ShardPool | None = None) -> web.Application:
+    async def on_webhook_startup(bot: Bot):
+        await on_startup(bot, shards)
+        if WEBHOOK_URL:
+            await bot.set_webhook(f"{WEBHOOK_URL}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET or None,
+                                  allowed_updates=dp.resolve_used_update_types())
+        else:
+            logging.warning("WEBHOOK_URL не задан: setWebhook не вызывается (локальный режим)")
+
+    async def on_webhook_shutdown():
+        # Вебхук не снимаем: пока контейнер перезапускается, Telegram копит апдейты у себя
+        if shards: shards.stop()
+        shutdown_chart_pool()
+
+    dp.startup.register(on_webhook_startup)
+    dp.shutdown.register(on_webhook_shutdown)
+
+    app = web.Application()
+    app.router.add_get("/healthz", healthz)
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET or None,
+                         handle_in_background=WEBHOOK_BACKGROUND).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+def run_webhook():
+    if WEBHOOK_URL and not WEBHOOK_SECRET:
+        raise SystemExit("Для публичного вебхука нужен WEBHOOK_SECRET")
+    shards = create_shards()
+    app = create_webhook_app(create_bot(), create_dispatcher(shards), shards)
+    # run_app сам ловит SIGINT/SIGTERM и проводит штатное завершение
+    web.run_app(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, print=None, access_log=None)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CookieHelper bot")
+    parser.add_argument("--mode", choices=["polling", "webhook"], default=BOT_MODE)
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        asyncio.run(main())
+        if args.mode == "webhook":
+            run_webhook()
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
-        print("Бот остановлен")
\ No newline at end of file
+        print("Бот остановлен")
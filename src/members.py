@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, replace
+from aiogram import BaseMiddleware, Bot
+from aiogram.types import Message
+
+MEMBER_TTL = 15 * 60       # Сколько секунд доверяем кэшу
+LOOKUP_CONCURRENCY = 5     # Одновременных запросов get_chat_member
+LOOKUP_TIMEOUT = 5         # Таймаут одного запроса
+
+INACTIVE_STATUSES = ('left', 'kicked')
+
+@dataclass
+class MemberInfo:
+    active: bool
+    full_name: str | None      # None — имя неизвестно, оставляем то, что в БД
+    expires_at: float
+    lookup_failed: bool = False  # Telegram не ответил: данные устаревшие или их нет вовсе
+
+class MembershipCache:
+    """Кэш статусов участников чата: (chat_id, tg_id) -> MemberInfo."""
+
+    def __init__(self, ttl: float = MEMBER_TTL, concurrency: int = LOOKUP_CONCURRENCY, timeout: float = LOOKUP_TIMEOUT):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._entries: dict[tuple[int, int], MemberInfo] = {}
+
+    def update(self, chat_id: int, tg_id: int, active: bool, full_name: str):
+        self._entries[(chat_id, tg_id)] = MemberInfo(active, full_name, time.monotonic() + self.ttl)
+
+    def get(self, chat_id: int, tg_id: int):
+        info = self._entries.get((chat_id, tg_id))
+        if info and info.expires_at > time.monotonic():
+            return info
+        return None
+
+    async def _fetch(self, bot: Bot, chat_id: int, tg_id: int):
+        async with self._semaphore:
+            try:
+                member = await asyncio.wait_for(bot.get_chat_member(chat_id=chat_id, user_id=tg_id), self.timeout)
+            except Exception as e:
+                logging.warning(f"get_chat_member {tg_id} не ответил: {e!r}")
+                # Лучше устаревшие данные, чем выпавший из отчета человек. Нет и их (пустой кэш после
+                # рестарта) — считаем участником с именем из БД. В кэш такое не кладем
+                known = self._entries.get((chat_id, tg_id))
+                if known: return replace(known, lookup_failed=True)
+                return MemberInfo(True, None, 0.0, lookup_failed=True)
+        self.update(chat_id, tg_id, member.status not in INACTIVE_STATUSES, member.user.full_name)
+        return self._entries[(chat_id, tg_id)]
+
+    async def resolve(self, bot: Bot, chat_id: int, tg_ids) -> dict:
+        """Возвращает {tg_id: MemberInfo}. Промахи запрашиваются параллельно."""
+        result = {tg_id: self.get(chat_id, tg_id) for tg_id in tg_ids}
+        misses = [tg_id for tg_id, info in result.items() if info is None]
+        if misses:
+            fetched = await asyncio.gather(*(self._fetch(bot, chat_id, tg_id) for tg_id in misses))
+            result.update(zip(misses, fetched))
+        return result
+
+members_cache = MembershipCache()
+
+class MembershipMiddleware(BaseMiddleware):
+    """Освежает кэш по входящим сообщениям: автор сообщения точно в чате."""
+
+    async def __call__(self, handler, event: Message, data):
+        if event.from_user and not event.from_user.is_bot:
+            members_cache.update(event.chat.id, event.from_user.id, True, event.from_user.full_name)
+        return await handler(event, data)
@@ -0,0 +1,224 @@
+"""Метрики горячих путей в формате Prometheus (без внешних зависимостей).
+
+Что меряем: обработчики апдейтов, SQL, рендер графиков, вызовы Telegram API, очередь outbox.
+Отдается на METRICS_HOST:METRICS_PORT/metrics (воркеры SHARD_WORKERS — на METRICS_PORT + 1 + номер воркера).
+"""
+import cProfile
+import io
+import itertools
+import logging
+import os
+import pstats
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError
+from sqlalchemy import event
+from src.config import SLOW_UPDATE_MS, PROFILE_EVERY, PROFILES_DIR
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def _labels_text(labels: tuple) -> str:
+    if not labels: return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels) + "}"
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help = name, help_text
+        self.values = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels):
+        self.values[tuple(sorted(labels.items()))] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels_text(k)} {v}" for k, v in self.values.items()]
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.buckets = name, help_text, buckets
+        self.series = {}  # labels -> [счетчики по бакетам..., сумма, кол-во]
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound: series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in self.series.items():
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels_text(key + (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_labels_text(key + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels_text(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels_text(key)} {series[-1]}")
+        return lines
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Время обработки апдейта по обработчикам")
+SQL_SECONDS = Histogram("bot_sql_seconds", "Время SQL-запросов по типу")
+CHART_SECONDS = Histogram("bot_chart_render_seconds", "Рендер графика (в пуле процессов)")
+CHART_CACHE = Counter("bot_chart_cache_total", "Обращения к кэшу графиков")
+TELEGRAM_SECONDS = Histogram("bot_telegram_api_seconds", "Вызовы Telegram API (без ожидания в очереди)")
+TELEGRAM_ERRORS = Counter("bot_telegram_api_errors_total", "Ошибки Telegram API")
+
+METRICS = [HANDLER_SECONDS, SQL_SECONDS, CHART_SECONDS, CHART_CACHE, TELEGRAM_SECONDS, TELEGRAM_ERRORS]
+_collectors = []  # Функции, которые отдают строки метрик на момент запроса
+
+def register_collector(collector):
+    _collectors.append(collector)
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    for collector in _collectors:
+        lines += collector()
+    return "\n".join(lines) + "\n"
+
+# --- SQL ---
+def instrument_engine(engine):
+    """Хуки SQLAlchemy на время каждого запроса."""
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        SQL_SECONDS.observe(time.perf_counter() - started, statement=kind)
+
+# --- ОБРАБОТЧИКИ ---
+_profiling = False
+_updates = itertools.count()
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware роутера: время апдейта целиком, с именем сработавшего обработчика.
+
+    Имя обработчика известно только внутри, поэтому его записывает HandlerNameMiddleware.
+    При SLOW_UPDATE_MS каждый апдейт дольше порога попадает в лог; каждый PROFILE_EVERY-й идет
+    под cProfile, и если он медленный, профиль сохраняется в data/profiles. cProfile видит весь event loop: в профиль попадают и
+    корутины других апдейтов, которые выполнялись в это время.
+    """
+
+    def __init__(self, event_type: str):
+        self.event_type = event_type
+
+    async def __call__(self, handler, event, data):
+        global _profiling
+        slot = data["metrics_slot"] = {}
+        profiler = None
+        if SLOW_UPDATE_MS and next(_updates) % PROFILE_EVERY == 0 and not _profiling:
+            # Выборка, а не каждый апдейт: профайлер замедляет все, что идет в loop.
+            # cProfile один на поток: остальные апдейты в это время только меряются
+            _profiling, profiler = True, cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = time.perf_counter() - start
+            name = slot.get("handler", "unhandled")
+            HANDLER_SECONDS.observe(elapsed, handler=name, event=self.event_type)
+            if profiler:
+                profiler.disable()
+                _profiling = False
+            if SLOW_UPDATE_MS and elapsed * 1000 >= SLOW_UPDATE_MS:
+                _log_slow(name, elapsed, profiler)
+
+class HandlerNameMiddleware(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        slot = data.get("metrics_slot")
+        if slot is not None:
+            slot["handler"] = data["handler"].callback.__name__
+        return await handler(event, data)
+
+def _log_slow(name: str, elapsed: float, profiler: cProfile.Profile | None):
+    """Медленный апдейт логируем всегда, профиль прикладываем, если он попал в выборку."""
+    if profiler is None:
+        logging.warning(f"🐢 {name} занял {elapsed * 1000:.0f} мс (без профиля: не попал в выборку)")
+        return
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    path = os.path.join(PROFILES_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{name}.prof")
+    profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(15)
+    logging.warning(f"🐢 {name} занял {elapsed * 1000:.0f} мс, профиль: {path}\n{out.getvalue()}")
+
+def instrument_router(router):
+    for event_type in ("message", "callback_query", "chat_member"):
+        observer = router.observers[event_type]
+        observer.outer_middleware(HandlerMetricsMiddleware(event_type))
+        observer.middleware(HandlerNameMiddleware())
+
+# --- СТАРТ ---
+class StartupMiddleware(BaseMiddleware):
+    """Внешний middleware на dp.update: время от запуска процесса до готовности и до первого апдейта."""
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at  # time.perf_counter() в самом начале src.main
+        self.ready = None
+        self.first_update = None
+        register_collector(self.render)
+
+    def mark_ready(self):
+        self.ready = time.perf_counter() - self.started_at
+        logging.info(f"🚀 Готов к приему апдейтов через {self.ready * 1000:.0f} мс")
+
+    async def __call__(self, handler, event, data):
+        if self.first_update is None:
+            self.first_update = time.perf_counter() - self.started_at
+            logging.info(f"🚀 Первый апдейт через {self.first_update * 1000:.0f} мс после запуска")
+        return await handler(event, data)
+
+    def render(self) -> list[str]:
+        lines = ["# TYPE bot_startup_seconds gauge"]
+        for stage, value in (("ready", self.ready), ("first_update", self.first_update)):
+            if value is not None:
+                lines.append(f'bot_startup_seconds{{stage="{stage}"}} {value:.6f}')
+        return lines
+
+# --- TELEGRAM API ---
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):
+        api_method = method.__api_method__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramAPIError as e:
+            TELEGRAM_ERRORS.inc(method=api_method, error=type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - start, method=api_method)
+
+# --- HTTP ---
+async def _metrics_handler(request: web.Request):
+    return web.Response(body=render_metrics().encode(),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+def add_metrics_route(app: web.Application):
+    app.router.add_get("/metrics", _metrics_handler)
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    add_metrics_route(app)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"📈 Метрики: http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,115 @@
+"""Версионные миграции схемы (версия хранится в PRAGMA user_version).
+
+Новая БД создается сразу по моделям и получает последнюю версию.
+Существующая проходит по всем миграциям новее своей версии — по порядку, в одной транзакции.
+Новую миграцию добавляем в конец MIGRATIONS, старые не меняем.
+
+Недостающие таблицы create_all создает до миграций уже в текущем виде (миграции на них опираются),
+поэтому миграция не должна падать на том, что уже есть: колонки добавляем через _add_column,
+индексы и таблицы — с IF [NOT] EXISTS.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import inspect
+from src.clock import from_epoch
+from src.config import GROUP_CHAT_ID
+
+def _add_column(conn, table: str, column: str, ddl: str):
+    """ALTER TABLE ADD COLUMN, если колонки еще нет (таблицу мог создать create_all по модели)."""
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+def _add_submission_indexes(conn):
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_submissions_user_ts_verified ON submissions (user_id, timestamp, verified, type)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_submissions_verified_id ON submissions (verified, id)")
+
+def _backfill_submission_media(conn):
+    # Таблицу уже создал create_all; у старых сабмитов ровно одно медиа
+    conn.exec_driver_sql(
+        "INSERT INTO submission_media (submission_id, position, file_id, file_type) "
+        "SELECT id, 0, file_id, file_type FROM submissions "
+        "WHERE file_id IS NOT NULL AND id NOT IN (SELECT submission_id FROM submission_media)"
+    )
+
+def _add_mod_message_columns(conn):
+    _add_column(conn, "submissions", "mod_chat_id", "BIGINT")
+    _add_column(conn, "submissions", "mod_message_id", "BIGINT")
+
+def _add_epoch_columns(conn):
+    _add_column(conn, "submissions", "ts", "BIGINT")
+    _add_column(conn, "submissions", "day", "DATE")
+
+    # Старые timestamp — naive время контейнера: .timestamp() трактует их как локальные для процесса
+    updates = []
+    for sub_id, raw in conn.exec_driver_sql("SELECT id, timestamp FROM submissions").all():
+        ts = int(datetime.fromisoformat(raw).timestamp()) if raw else int(datetime.now().timestamp())
+        local = from_epoch(ts)
+        updates.append((ts, local.date().isoformat(), local.strftime("%Y-%m-%d %H:%M:%S.%f"), sub_id))
+    if updates:
+        conn.exec_driver_sql("UPDATE submissions SET ts = ?, day = ?, timestamp = ? WHERE id = ?", updates)
+
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_submissions_user_ts_verified")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_submissions_user_day_verified ON submissions (user_id, day, verified, type)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_submissions_ts ON submissions (ts)")
+
+    # Дни могли сдвинуться: сводку пересобираем, готовые отчеты выбрасываем
+    conn.exec_driver_sql("DELETE FROM daily_counts")
+    conn.exec_driver_sql(
+        "INSERT INTO daily_counts (user_id, day, type, count) "
+        "SELECT user_id, day, type, COUNT(*) FROM submissions WHERE verified = 1 GROUP BY user_id, day, type"
+    )
+    conn.exec_driver_sql("DELETE FROM stored_reports")
+
+def _add_chat_scope(conn):
+    # UNIQUE(tg_id) в SQLite не снять ALTER-ом: пересоздаем users (новая, копия, drop, rename)
+    if "chat_id" not in {c["name"] for c in inspect(conn).get_columns("users")}:
+        conn.exec_driver_sql(
+            "CREATE TABLE users_new (id INTEGER NOT NULL PRIMARY KEY, chat_id BIGINT NOT NULL, tg_id BIGINT NOT NULL, "
+            "name VARCHAR NOT NULL, role VARCHAR, CONSTRAINT uq_users_chat_tg UNIQUE (chat_id, tg_id))"
+        )
+        conn.exec_driver_sql("INSERT INTO users_new (id, chat_id, tg_id, name, role) SELECT id, ?, tg_id, name, role FROM users",
+                             (GROUP_CHAT_ID,))
+        conn.exec_driver_sql("DROP TABLE users")
+        conn.exec_driver_sql("ALTER TABLE users_new RENAME TO users")
+
+    _add_column(conn, "submissions", "chat_id", "BIGINT")
+    conn.exec_driver_sql("UPDATE submissions SET chat_id = (SELECT chat_id FROM users WHERE users.id = submissions.user_id) "
+                         "WHERE chat_id IS NULL")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_submissions_chat_verified_id ON submissions (chat_id, verified, id)")
+    # Если penalty_rules появилась в этом же деплое, create_all уже создал ее с chat_id
+    _add_column(conn, "penalty_rules", "chat_id", "BIGINT")
+
+    # Временные данные с новым ключом: таблицы создаст заново create_all после миграций
+    conn.exec_driver_sql("DROP TABLE IF EXISTS pending_media")
+    conn.exec_driver_sql("DROP TABLE IF EXISTS stored_reports")
+
+MIGRATIONS = [
+    (1, "индексы submissions для статистики и модерации", _add_submission_indexes),
+    (2, "submission_media: несколько медиа на сабмит (альбомы)", _backfill_submission_media),
+    (3, "submissions.mod_chat_id/mod_message_id для пакетной модерации", _add_mod_message_columns),
+    (4, "submissions.ts (UTC epoch) и day (локальный день TIMEZONE), сводка по day", _add_epoch_columns),
+    (5, "chat_id у users/submissions/penalty_rules: несколько групп", _add_chat_scope),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def set_version(conn, version: int):
+    conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+def run_migrations(conn, metadata):
+    """Вызывается из init_db через run_sync на старте бота."""
+    fresh = not inspect(conn).has_table("submissions")
+    metadata.create_all(conn)  # Только отсутствующие таблицы, сразу по текущим моделям
+    if fresh:
+        set_version(conn, LATEST_VERSION)
+        return
+
+    current = get_version(conn)
+    for version, description, migrate in MIGRATIONS:
+        if version <= current: continue
+        logging.info(f"🛠 Миграция БД {version}: {description}")
+        migrate(conn)
+        set_version(conn, version)
+    metadata.create_all(conn)  # Таблицы, которые миграция пересоздала
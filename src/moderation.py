@@ -0,0 +1,54 @@
+from collections import Counter
+from datetime import date
+from sqlalchemy import select, update, delete, and_
+from src.database import User, Submission, SubmissionMedia
+from src.rollup import bump_daily_counts
+from src.reports import invalidate_stored_reports
+
+QUEUE_PAGE = 15  # Сабмитов на страницу /queue
+
+async def fetch_queue_page(session, chat_id: int, after_id: int = 0, limit: int = QUEUE_PAGE):
+    """Неподтвержденные сабмиты группы после after_id (keyset по индексу chat_id, verified, id).
+
+    Возвращает (строки, есть ли еще). Строка: (id, user_id, имя, timestamp, day, type).
+    """
+    rows = (await session.execute(
+        select(Submission.id, Submission.user_id, User.name, Submission.timestamp, Submission.day, Submission.type)
+        .join(User, User.id == Submission.user_id)
+        .where(Submission.chat_id == chat_id, Submission.verified == False, Submission.id > after_id)
+        .order_by(Submission.id)
+        .limit(limit + 1)
+    )).all()
+    return rows[:limit], len(rows) > limit
+
+def _day_filter(user_id: int, day: date):
+    # Равенство по (user_id, day, verified) — индекс ix_submissions_user_day_verified
+    return and_(Submission.user_id == user_id, Submission.day == day, Submission.verified == False)
+
+async def resolve_user_day(session, user_id: int, day: date, approve: bool) -> list[tuple[int, int]]:
+    """Принимает/отклоняет все ожидающие сабмиты юзера за день одним UPDATE/DELETE.
+
+    Сводка обновляется в той же транзакции, коммит делает вызывающий.
+    Возвращает [(chat_id, message_id)] по каждому сабмиту: сообщения модерации, с которых
+    надо снять кнопки (None у сабмитов, созданных до миграции 3).
+    """
+    ids = (await session.execute(select(Submission.id).where(_day_filter(user_id, day)))).scalars().all()
+    if not ids: return []
+
+    # RETURNING: в сводку идут только реально измененные строки (параллельный клик по одиночной кнопке)
+    returning = (Submission.id, Submission.type, Submission.mod_chat_id, Submission.mod_message_id)
+    if approve:
+        rows = (await session.execute(
+            update(Submission).where(Submission.id.in_(ids), Submission.verified == False)
+            .values(verified=True).returning(*returning)
+        )).all()
+        await bump_daily_counts(session, Counter((user_id, day, row.type) for row in rows))
+        if rows: await invalidate_stored_reports(session, day)
+    else:
+        rows = (await session.execute(
+            delete(Submission).where(Submission.id.in_(ids), Submission.verified == False).returning(*returning)
+        )).all()
+        # Медиа — только у реально удаленных: принятый за это время сабмит свои сохраняет
+        deleted = [row.id for row in rows]
+        if deleted: await session.execute(delete(SubmissionMedia).where(SubmissionMedia.submission_id.in_(deleted)))
+    return [(row.mod_chat_id, row.mod_message_id) for row in rows]
@@ -0,0 +1,246 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+# Лимиты Telegram: ~30 сообщений/сек на бота, ~20/мин в одну группу
+GLOBAL_RATE, GLOBAL_BURST = 25.0, 25
+CHAT_RATE, CHAT_BURST = 20 / 60, 8
+MAX_RETRIES = 3
+SLOW_WAIT_SEC = 5  # Логируем запросы, которые простояли в очереди дольше
+
+class Priority(IntEnum):
+    MODERATION = 0   # Кнопки модерации: правки и ответы на колбэки
+    INTERACTIVE = 1  # Обычные ответы бота
+    BULK = 2         # Отчеты и удаление старых сообщений
+
+MODERATION_METHODS = {"answerCallbackQuery", "editMessageCaption", "editMessageText", "editMessageReplyMarkup"}
+EDIT_METHODS = MODERATION_METHODS - {"answerCallbackQuery"}
+DELETE_METHODS = {"deleteMessage", "deleteMessages"}
+# Чтения и служебные вызовы идут мимо очереди
+BYPASS_METHODS = {"getUpdates", "getMe", "getChatMember", "getChat", "getFile", "setWebhook", "deleteWebhook", "getWebhookInfo"}
+
+_lane: ContextVar[Priority | None] = ContextVar("outbox_lane", default=None)
+
+@contextmanager
+def outbox_lane(priority: Priority):
+    """Все запросы внутри блока идут с этим приоритетом (например, отчет — BULK)."""
+    token = _lane.set(priority)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать до свободного токена (0 — можно сейчас)."""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class _Job:
+    __slots__ = ("priority", "seq", "chat_id", "method", "target", "waiter", "enqueued_at")
+
+    def __init__(self, priority, seq, chat_id, method, target, waiter):
+        self.priority, self.seq = priority, seq
+        self.chat_id, self.method, self.target = chat_id, method, target
+        self.waiter = waiter
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+_DROPPED = object()
+
+class SendScheduler:
+    """Центральная очередь исходящих запросов к Telegram.
+
+    Запрос ждет в очереди, пока глобальный и чатовый бакеты не дадут токен,
+    более важные полосы обслуживаются первыми. Правки сообщения, которое уже
+    удаляется (или правится заново), выбрасываются из очереди.
+    """
+
+    def __init__(self):
+        self.global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self.chat_buckets: dict[int | str, TokenBucket] = {}
+        self._queue: list[_Job] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.stats = {
+            "sent": 0, "dropped": 0, "retries": 0,
+            "wait_count": [0] * len(Priority), "wait_sum": [0.0] * len(Priority), "wait_max": [0.0] * len(Priority),
+        }
+
+    def depth(self) -> dict[str, int]:
+        depth = {p.name.lower(): 0 for p in Priority}
+        for job in self._queue:
+            depth[Priority(job.priority).name.lower()] += 1
+        return depth
+
+    def share_global_rate(self, processes: int):
+        """Общий лимит бота делится поровну между процессами (SHARD_WORKERS)."""
+        self.global_bucket = TokenBucket(GLOBAL_RATE / processes, max(1, GLOBAL_BURST // processes))
+
+    def _chat_bucket(self, chat_id):
+        if chat_id not in self.chat_buckets:
+            self.chat_buckets[chat_id] = TokenBucket(CHAT_RATE, CHAT_BURST)
+        return self.chat_buckets[chat_id]
+
+    def _coalesce(self, api_method: str, chat_id, target: tuple):
+        """Выкидывает из очереди правки сообщений, которые новый запрос делает бессмысленными.
+
+        Удаление отменяет любые правки сообщения, правка — только более старые правки тем же методом
+        (подпись и кнопки правятся разными методами и друг друга не перекрывают).
+        """
+        if not target or not (api_method in DELETE_METHODS or api_method in EDIT_METHODS): return
+        kept = []
+        for job in self._queue:
+            overridden = api_method in DELETE_METHODS or job.method == api_method
+            if job.chat_id == chat_id and job.method in EDIT_METHODS and overridden and set(job.target) & set(target):
+                if not job.waiter.done(): job.waiter.set_result(_DROPPED)
+                self.stats["dropped"] += 1
+            else:
+                kept.append(job)
+        if len(kept) != len(self._queue):
+            self._queue = kept
+            heapq.heapify(self._queue)
+
+    async def acquire(self, priority: Priority, api_method: str, chat_id, target: tuple) -> bool:
+        """Ждет своей очереди. False — запрос выброшен при схлопывании."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._coalesce(api_method, chat_id, target)
+
+        waiter = asyncio.get_running_loop().create_future()
+        job = _Job(int(priority), next(self._seq), chat_id, api_method, target, waiter)
+        heapq.heappush(self._queue, job)
+        self._wakeup.set()
+        result = await waiter
+        if result is _DROPPED:
+            return False
+
+        waited = time.monotonic() - job.enqueued_at
+        self.stats["wait_count"][job.priority] += 1
+        self.stats["wait_sum"][job.priority] += waited
+        self.stats["wait_max"][job.priority] = max(self.stats["wait_max"][job.priority], waited)
+        if waited > SLOW_WAIT_SEC:
+            logging.info(f"📮 {api_method} ждал в очереди {waited:.1f} с (глубина {len(self._queue)})")
+        return True
+
+    def retry_after(self, chat_id, seconds: float):
+        self.stats["retries"] += 1
+        (self._chat_bucket(chat_id) if chat_id is not None else self.global_bucket).block(seconds)
+        self._wakeup.set()
+
+    def _release_next(self, now: float) -> float:
+        """Отпускает самый важный запрос, для которого есть токены. 0 — отпустил, иначе сколько ждать."""
+        wait = self.global_bucket.delay(now)
+        if wait > 0: return wait
+
+        soonest = float("inf")
+        for job in sorted(self._queue):
+            # Удаления не упираются в лимит чата, только в общий
+            bucket = None if job.chat_id is None or job.method in DELETE_METHODS else self._chat_bucket(job.chat_id)
+            wait = bucket.delay(now) if bucket else 0.0
+            if wait > 0:
+                soonest = min(soonest, wait)
+                continue
+            self.global_bucket.take()
+            if bucket: bucket.take()
+            self._queue.remove(job)
+            heapq.heapify(self._queue)
+            job.waiter.set_result(True)
+            self.stats["sent"] += 1
+            return 0.0
+        return soonest
+
+    async def _run(self):
+        while True:
+            # Отмененные ожидания убираем
+            self._queue = [job for job in self._queue if not job.waiter.done()]
+            heapq.heapify(self._queue)
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            wait = self._release_next(time.monotonic())
+            if wait <= 0: continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+outbox = SendScheduler()
+
+def _classify(api_method: str) -> Priority:
+    if api_method in MODERATION_METHODS: return Priority.MODERATION
+    if api_method in DELETE_METHODS: return Priority.BULK
+    return Priority.INTERACTIVE
+
+class OutboxMiddleware(BaseRequestMiddleware):
+    """Пропускает все запросы бота через outbox: лимиты, приоритеты и повтор после flood control."""
+
+    def __init__(self, scheduler: SendScheduler = outbox):
+        self.scheduler = scheduler
+
+    async def __call__(self, make_request, bot, method):
+        api_method = method.__api_method__
+        if api_method in BYPASS_METHODS:
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        message_ids = getattr(method, "message_ids", None) or [getattr(method, "message_id", None)]
+        target = tuple(m_id for m_id in message_ids if m_id is not None)
+        priority = _lane.get()
+        if priority is None or api_method in MODERATION_METHODS:
+            priority = _classify(api_method)
+
+        for attempt in range(MAX_RETRIES + 1):
+            if not await self.scheduler.acquire(priority, api_method, chat_id, target):
+                return True  # Схлопнуто: сообщение все равно удаляется или перезаписано
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == MAX_RETRIES: raise
+                logging.warning(f"Flood control на {api_method} в {chat_id}: ждем {e.retry_after} с")
+                self.scheduler.retry_after(chat_id, e.retry_after)
+
+def render_outbox_metrics() -> list[str]:
+    """Состояние очереди для /metrics."""
+    lines = ["# TYPE bot_outbox_depth gauge"]
+    lines += [f'bot_outbox_depth{{lane="{lane}"}} {n}' for lane, n in outbox.depth().items()]
+    lines.append("# TYPE bot_outbox_wait_seconds summary")
+    for p in Priority:
+        lane = p.name.lower()
+        lines.append(f'bot_outbox_wait_seconds_sum{{lane="{lane}"}} {outbox.stats["wait_sum"][p]}')
+        lines.append(f'bot_outbox_wait_seconds_count{{lane="{lane}"}} {outbox.stats["wait_count"][p]}')
+    for name in ("sent", "dropped", "retries"):
+        lines.append(f"# TYPE bot_outbox_{name}_total counter")
+        lines.append(f"bot_outbox_{name}_total {outbox.stats[name]}")
+    return lines
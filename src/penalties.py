@@ -0,0 +1,116 @@
+from collections import defaultdict
+
+# Виды правил
+DAILY_MIN = "daily_min"        # Минимум за день, иначе +1 штраф за этот день
+PER_ITEM = "per_item"          # value штрафов за каждую штуку (читы)
+PERIOD_QUOTA = "period_quota"  # План на период, +1 за каждую недостающую
+
+METRICS = ("meals", "workouts", "cheats")
+METRIC_NAMES = {"meals": "Еда", "workouts": "Зал", "cheats": "Читы"}
+
+# Тексты причин по умолчанию. Доступны {count}, {value}, {missing}, {done}
+DEFAULT_LABELS = {
+    (DAILY_MIN, "meals"): "Нет еды",
+    (DAILY_MIN, "workouts"): "Нет зала",
+    (PER_ITEM, "cheats"): "Читы ({count})",
+}
+FALLBACK_LABELS = {
+    DAILY_MIN: "{name}: {count}/{value}",
+    PER_ITEM: "{name} ({count})",
+    PERIOD_QUOTA: "{name} (Период): Осталось {missing}",
+}
+QUOTA_NOTE = " (План: {value}/мес. Сделано: {done})"
+
+# Правила для всех, у кого нет своих (user_id = NULL в БД)
+DEFAULT_RULES = [
+    {"kind": DAILY_MIN, "metric": "meals", "value": 1},
+    {"kind": DAILY_MIN, "metric": "workouts", "value": 1},
+    {"kind": PER_ITEM, "metric": "cheats", "value": 1},
+]
+
+
+def _label(rule):
+    if rule.label: return rule.label
+    # «Нет еды» верно только для минимума 1: при минимуме 3 и двух приемах еда была
+    if rule.kind == DAILY_MIN and rule.value != 1: return FALLBACK_LABELS[DAILY_MIN]
+    return DEFAULT_LABELS.get((rule.kind, rule.metric)) or FALLBACK_LABELS[rule.kind]
+
+
+def evaluate_penalties(user_ids, day_labels, matrices, rules):
+    """Считает штрафы всех юзеров за один проход.
+
+    matrices: {metric: np.ndarray (юзеры x дни)}, rules: объекты с полями
+    user_id, kind, metric, value, label. Юзеры без своих правил получают правила с user_id=None.
+    Возвращает список словарей (в порядке user_ids).
+    """
+    import numpy as np  # Лениво: не тормозит старт бота, прогревается в фоне
+    n_users = len(user_ids)
+    row_of = {uid: i for i, uid in enumerate(user_ids)}
+
+    own, defaults = defaultdict(list), []
+    for rule in rules:
+        if rule.user_id is None: defaults.append(rule)
+        elif rule.user_id in row_of: own[rule.user_id].append(rule)
+
+    # Раскладываем правила в векторы по (вид, метрика): одна операция на группу, а не на юзера
+    groups = {}
+    for uid in user_ids:
+        for pos, rule in enumerate(own.get(uid) or defaults):
+            if rule.kind not in FALLBACK_LABELS or rule.metric not in METRICS: continue
+            if (rule.kind, rule.metric) not in groups:
+                groups[(rule.kind, rule.metric)] = (np.zeros(n_users, dtype=int), np.zeros(n_users, dtype=int), [None] * n_users)
+            values, positions, labels = groups[(rule.kind, rule.metric)]
+            u = row_of[uid]
+            values[u], positions[u], labels[u] = rule.value, pos, _label(rule)
+
+    n_days = len(day_labels)
+    daily_penalty = np.zeros((n_users, n_days), dtype=int)
+    period_penalty = np.zeros(n_users, dtype=int)
+    cell_reasons = defaultdict(list)  # (u, d) -> [(позиция правила, текст)]
+    period_reasons = [[] for _ in range(n_users)]
+    notes = [""] * n_users
+
+    for (kind, metric), (values, positions, labels) in groups.items():
+        counts = matrices[metric]
+        active = values > 0
+        name = METRIC_NAMES[metric]
+
+        if kind == PERIOD_QUOTA:
+            done = counts.sum(axis=1)
+            missing = np.maximum(0, values - done) * active
+            period_penalty += missing
+            for u in np.flatnonzero(active):
+                notes[u] += QUOTA_NOTE.format(value=values[u], done=done[u])
+                if missing[u]:
+                    period_reasons[u].append(labels[u].format(name=name, value=values[u], done=done[u], missing=missing[u]))
+            continue
+
+        if kind == DAILY_MIN:
+            hit = (counts < values[:, None]) & active[:, None]
+            daily_penalty += hit
+        else:  # PER_ITEM
+            hit = (counts > 0) & active[:, None]
+            daily_penalty += counts * values[:, None]
+
+        for u, d in zip(*np.nonzero(hit)):
+            text = labels[u].format(name=name, count=counts[u, d], value=values[u])
+            cell_reasons[(u, d)].append((positions[u], text))
+
+    reasons = [[] for _ in range(n_users)]
+    for (u, d) in sorted(cell_reasons):
+        texts = [text for _, text in sorted(cell_reasons[(u, d)], key=lambda item: item[0])]
+        reasons[u].append(f"{day_labels[d]}: {', '.join(texts)}")
+
+    totals = daily_penalty.sum(axis=1) + period_penalty
+    meals = matrices["meals"].sum(axis=1)
+    workouts = matrices["workouts"].sum(axis=1)
+    return [
+        {
+            'total_penalty': int(totals[u]),
+            'total_meals': int(meals[u]),
+            'total_workouts': int(workouts[u]),
+            'reasons': reasons[u] + period_reasons[u],
+            'note': notes[u],
+        }
+        for u in range(n_users)
+    ]
@@ -0,0 +1,77 @@
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import delete
+from src.config import PENDING_MEDIA_BACKEND
+from src.database import async_session, PendingMedia
+
+PENDING_TTL = 5 * 60   # Сколько ждем хештег после медиа
+PENDING_MAX = 1000     # Потолок записей в памяти
+
+class MemoryPendingStore:
+    """{(chat_id, user_id): медиа} с TTL и ограничением размера (самые старые вытесняются)."""
+
+    def __init__(self, ttl: float = PENDING_TTL, max_size: int = PENDING_MAX):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: OrderedDict[tuple[int, int], tuple[float, dict]] = OrderedDict()
+
+    async def put(self, chat_id: int, user_id: int, item: dict):
+        key = (chat_id, user_id)
+        self._items.pop(key, None)
+        self._items[key] = (time.monotonic() + self.ttl, item)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    async def pop(self, chat_id: int, user_id: int):
+        expires_at, item = self._items.pop((chat_id, user_id), (0, None))
+        return item if expires_at > time.monotonic() else None
+
+    async def sweep(self) -> int:
+        # Порядок вставки = порядок истечения, поэтому чистим с головы
+        now, removed = time.monotonic(), 0
+        while self._items:
+            key, (expires_at, _) = next(iter(self._items.items()))
+            if expires_at > now: break
+            del self._items[key]
+            removed += 1
+        return removed
+
+    def __len__(self):
+        return len(self._items)
+
+class SqlitePendingStore:
+    """То же самое в таблице pending_media: пара «фото, потом хештег» переживает редеплой."""
+
+    def __init__(self, ttl: float = PENDING_TTL):
+        self.ttl = ttl
+
+    async def put(self, chat_id: int, user_id: int, item: dict):
+        async with async_session() as session:
+            await session.merge(PendingMedia(
+                chat_id=chat_id, user_id=user_id, payload=json.dumps(item),
+                expires_at=datetime.now() + timedelta(seconds=self.ttl),
+            ))
+            await session.commit()
+
+    async def pop(self, chat_id: int, user_id: int):
+        async with async_session() as session:
+            row = await session.get(PendingMedia, (chat_id, user_id))
+            if row is None: return None
+            await session.delete(row)
+            await session.commit()
+            return json.loads(row.payload) if row.expires_at > datetime.now() else None
+
+    async def sweep(self) -> int:
+        async with async_session() as session:
+            result = await session.execute(delete(PendingMedia).where(PendingMedia.expires_at <= datetime.now()))
+            await session.commit()
+            return result.rowcount
+
+def create_pending_store():
+    if PENDING_MEDIA_BACKEND == "sqlite":
+        return SqlitePendingStore()
+    return MemoryPendingStore()
+
+pending_media = create_pending_store()
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, delete, and_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.database import async_session, StoredReport, ReportInvalidation
+
+REPORT_CACHE_SIZE = 64
+STORED_REPORT_DAYS = 45  # Сколько дней храним готовые отчеты (прошлый месяц кончился не раньше ~31 дня назад)
+
+# Версия данных: растет при любом изменении, которое видно в отчете
+# (новый сабмит, модерация, смена имени/состава). Старые ключи кэша просто перестают совпадать.
+_data_version = 0
+_shared_version = None  # multiprocessing.Value при SHARD_WORKERS: версия общая для всех процессов
+
+def share_data_version(value):
+    global _shared_version
+    _shared_version = value
+
+def bump_data_version():
+    global _data_version
+    if _shared_version is not None:
+        with _shared_version.get_lock():
+            _shared_version.value += 1
+        return
+    _data_version += 1
+
+def data_version() -> int:
+    return _shared_version.value if _shared_version is not None else _data_version
+
+@dataclass
+class CachedReport:
+    text: str | None     # None — "Нет данных"
+    file_id: str | None  # file_id уже загруженного в Telegram графика
+
+class ReportCache:
+    """(чат, границы периода, заголовок, версия данных) -> готовый отчет."""
+
+    def __init__(self, max_size: int = REPORT_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: OrderedDict[tuple, CachedReport] = OrderedDict()
+
+    @staticmethod
+    def key(chat_id: int, start_date: datetime, end_date: datetime, title: str) -> tuple:
+        return (chat_id, start_date.date(), end_date.date(), title, data_version())
+
+    def get(self, key: tuple):
+        report = self._items.get(key)
+        if report is not None:
+            self._items.move_to_end(key)
+        return report
+
+    def put(self, key: tuple, report: CachedReport):
+        if key[-1] != data_version(): return  # Данные поменялись, пока считали
+        self._items[key] = report
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+report_cache = ReportCache()
+
+# --- ГОТОВЫЕ ОТЧЕТЫ ЗА ЗАВЕРШЕННЫЕ ПЕРИОДЫ ---
+def stored_kind(start_date: datetime, end_date: datetime) -> str | None:
+    """Храним только периоды дайджестов: день, неделя пн-вс, календарный месяц. Кастомные — нет."""
+    start, end = start_date.date(), end_date.date()
+    if start == end: return "daily"
+    if start.weekday() == 0 and end - start == timedelta(days=6): return "weekly"
+    if start.day == 1 and (start.year, start.month) == (end.year, end.month) and (end + timedelta(days=1)).day == 1:
+        return "monthly"
+    return None
+
+def retitle(text: str | None, title: str) -> str | None:
+    """Заголовок сохраненного отчета — тот, что запросили сейчас (первая строка format_report)."""
+    if text is None: return None
+    return f"📅 <b>{title}</b>\n" + text.partition("\n")[2]
+
+async def load_stored_report(chat_id: int, start_date: datetime, end_date: datetime) -> StoredReport | None:
+    async with async_session() as session:
+        return (await session.execute(select(StoredReport).where(
+            StoredReport.chat_id == chat_id,
+            StoredReport.start_day == start_date.date(), StoredReport.end_day == end_date.date(),
+        ))).scalar_one_or_none()
+
+async def store_report(chat_id: int, kind: str, start_date: datetime, end_date: datetime, title: str,
+                       text: str | None, chart: bytes | None, file_id: str | None, since: datetime) -> bool:
+    """Сохраняет отчет, посчитанный начиная с since. False — за это время модерация тронула его дни."""
+    start_day, end_day = start_date.date(), end_date.date()
+    values = {"kind": kind, "title": title, "text": text, "chart": chart, "file_id": file_id, "created_at": datetime.now()}
+    stmt = sqlite_insert(StoredReport).values(chat_id=chat_id, start_day=start_day, end_day=end_day, **values)
+    period = [StoredReport.chat_id, StoredReport.start_day, StoredReport.end_day]
+    async with async_session() as session:
+        await session.execute(stmt.on_conflict_do_update(index_elements=period, set_=values))
+        # Проверяем после записи: модерация, закоммиченная позже, сама удалит строку
+        stale = (await session.execute(select(ReportInvalidation.day).where(
+            ReportInvalidation.day.between(start_day, end_day), ReportInvalidation.invalidated_at >= since,
+        ).limit(1))).first()
+        if stale:
+            await session.rollback()
+            return False
+        await session.commit()
+    return True
+
+async def invalidate_stored_reports(session, day: date):
+    """Модерация задним числом: готовые отчеты (всех групп), куда попадает day, больше не верны.
+
+    Отмечает день, чтобы не сохранился отчет, который считался параллельно.
+    Коммит делает вызывающий (та же транзакция, что и модерация).
+    """
+    await session.execute(delete(StoredReport).where(and_(StoredReport.start_day <= day, StoredReport.end_day >= day)))
+    now = datetime.now()
+    await session.execute(sqlite_insert(ReportInvalidation).values(day=day, invalidated_at=now)
+                          .on_conflict_do_update(index_elements=[ReportInvalidation.day], set_={"invalidated_at": now}))
+
+async def prune_stored_reports(today: date):
+    """Выбрасывает старые готовые отчеты и отметки модерации, которые уже ничего не защищают."""
+    async with async_session() as session:
+        await session.execute(delete(StoredReport).where(StoredReport.end_day < today - timedelta(days=STORED_REPORT_DAYS)))
+        await session.execute(delete(ReportInvalidation).where(ReportInvalidation.invalidated_at < datetime.now() - timedelta(days=1)))
+        await session.commit()
+
+def format_report(stats: dict, title: str) -> str:
+    text_lines = [f"📅 <b>{title}</b>\n"]
+    for name, data in stats.items():
+        reasons_display = data['reasons']
+        line = (f"👤 <b>{name}</b>:\n"
+                f"   🥗 Еда: <b>{data['total_meals']}</b> | 🏋️‍♂️ Зал: <b>{data['total_workouts']}</b>\n"
+                f"   ⚠️ Штрафы: <b>{data['total_penalty']}</b>{data['note']}\n"
+                f"   📝 <i>Причины:</i> {reasons_display}")
+        text_lines.append(line)
+    return "\n\n".join(text_lines)
@@ -0,0 +1,57 @@
+import asyncio
+from datetime import date
+from sqlalchemy import select, delete, insert, func, literal_column
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.database import async_session, init_db, Submission, DailyCount
+
+async def bump_daily_count(session, sub: Submission, delta: int):
+    """+delta к сводке за день сабмита. Коммит делает вызывающий (та же транзакция)."""
+    stmt = sqlite_insert(DailyCount).values(user_id=sub.user_id, day=sub.day, type=sub.type, count=delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyCount.user_id, DailyCount.day, DailyCount.type],
+        set_={"count": DailyCount.count + delta},
+    )
+    await session.execute(stmt)
+
+async def bump_daily_counts(session, deltas: dict[tuple[int, date, str], int]):
+    """То же пачкой: {(user_id, день, тип): delta} одним executemany."""
+    if not deltas: return
+    stmt = sqlite_insert(DailyCount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyCount.user_id, DailyCount.day, DailyCount.type],
+        set_={"count": DailyCount.count + stmt.excluded.count},
+    )
+    await session.execute(stmt, [
+        {"user_id": user_id, "day": day, "type": sub_type, "count": delta}
+        for (user_id, day, sub_type), delta in deltas.items()
+    ])
+
+async def rebuild_daily_counts(session):
+    """Пересобирает сводку целиком из submissions."""
+    source = (
+        select(Submission.user_id, Submission.day, Submission.type, func.count())
+        .where(Submission.verified == True)
+        .group_by(Submission.user_id, Submission.day, Submission.type)
+    )
+    await session.execute(delete(DailyCount))
+    await session.execute(insert(DailyCount).from_select(["user_id", "day", "type", "count"], source))
+
+async def ensure_daily_counts():
+    """Первый запуск после обновления: сводка пустая, а подтвержденные сабмиты есть."""
+    async with async_session() as session:
+        has_rollup = (await session.execute(select(literal_column("1")).select_from(DailyCount).limit(1))).first()
+        has_verified = (await session.execute(select(Submission.id).where(Submission.verified == True).limit(1))).first()
+        if has_verified and not has_rollup:
+            await rebuild_daily_counts(session)
+            await session.commit()
+
+async def main():
+    await init_db()
+    async with async_session() as session:
+        await rebuild_daily_counts(session)
+        await session.commit()
+    print("✅ daily_counts пересобрана")
+
+if __name__ == "__main__":
+    # Ручной пересчет: python -m src.rollup
+    asyncio.run(main())
@@ -1,14 +1,86 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from sqlalchemy import select, delete
 from src.config import TIMEZONE
+from src.database import async_session, AutoDelete
+from src.pending import pending_media
+from src.storage import fsm_storage
+from src.tags import reload_classifier
 
 scheduler = AsyncIOScheduler(timezone=TIMEZONE)
 
-async def delete_msg_job(bot: Bot, chat_id: int, message_id: int):
+PENDING_SWEEP_SEC = 60      # Чистка просроченных медиа без хештега
+TAGS_RELOAD_SEC = 60        # Подхват тегов, измененных прямо в БД
+FSM_SWEEP_SEC = 10 * 60     # Чистка брошенных состояний FSM
+AUTODELETE_SWEEP_SEC = 15   # Как часто проверяем очередь удаления
+AUTODELETE_BATCH = 1000     # Сколько строк забираем за один проход
+DELETE_MESSAGES_LIMIT = 100 # Лимит deleteMessages в Telegram
+
+async def enqueue_autodelete(chat_id: int, message_ids: list[int], delay_sec: int = 300):
+    delete_at = datetime.now() + timedelta(seconds=delay_sec)
+    async with async_session() as session:
+        session.add_all(AutoDelete(chat_id=chat_id, message_id=m_id, delete_at=delete_at) for m_id in message_ids)
+        await session.commit()
+
+async def _delete_batch(bot: Bot, chat_id: int, message_ids: list[int]):
+    """Сеть, 5xx и flood control пробрасываем: строки останутся до следующего прохода."""
     try:
-        await bot.delete_message(chat_id=chat_id, message_id=message_id)
-    except Exception:
-        pass # Сообщение уже удалено или нет прав
+        await bot.delete_messages(chat_id=chat_id, message_ids=message_ids)
+    except (TelegramBadRequest, TelegramForbiddenError):
+        # Пачка отклонена целиком (нет прав и т.п.) — пробуем по одному, отказы игнорируем
+        for message_id in message_ids:
+            try:
+                await bot.delete_message(chat_id=chat_id, message_id=message_id)
+            except (TelegramBadRequest, TelegramForbiddenError):
+                pass # Сообщение уже удалено или нет прав
+
+async def sweep_autodelete(bot: Bot):
+    """Удаляет все сообщения, у которых подошел срок, пачками по чатам."""
+    async with async_session() as session:
+        due = (await session.execute(
+            select(AutoDelete.id, AutoDelete.chat_id, AutoDelete.message_id)
+            .where(AutoDelete.delete_at <= datetime.now())
+            .order_by(AutoDelete.delete_at)
+            .limit(AUTODELETE_BATCH)
+        )).all()
+        if not due: return
+
+        by_chat = defaultdict(list)
+        for _, chat_id, message_id in due:
+            by_chat[chat_id].append(message_id)
+
+        done_chats = set()
+        for chat_id, message_ids in by_chat.items():
+            try:
+                for i in range(0, len(message_ids), DELETE_MESSAGES_LIMIT):
+                    await _delete_batch(bot, chat_id, message_ids[i:i + DELETE_MESSAGES_LIMIT])
+                done_chats.add(chat_id)
+            except Exception as e:
+                # Сеть и т.п. — строки остаются, повторим на следующем проходе
+                logging.warning(f"Автоудаление в {chat_id} не удалось: {e!r}")
+
+        done_ids = [row_id for row_id, chat_id, _ in due if chat_id in done_chats]
+        if done_ids:
+            await session.execute(delete(AutoDelete).where(AutoDelete.id.in_(done_ids)))
+            await session.commit()
+
+def start_scheduler(bot: Bot, shared_jobs: bool = True, local_jobs: bool = True):
+    """shared_jobs — общие на весь бот (автоудаление), local_jobs — кэши и буферы этого процесса.
 
-def start_scheduler(bot: Bot):
-    scheduler.start()
\ No newline at end of file
+    При SHARD_WORKERS главный процесс берет только общие задачи, воркеры — только свои.
+    """
+    if shared_jobs:
+        scheduler.add_job(sweep_autodelete, 'interval', seconds=AUTODELETE_SWEEP_SEC, args=[bot],
+                          id="autodelete_sweep", max_instances=1, coalesce=True, replace_existing=True)
+    if local_jobs:
+        scheduler.add_job(pending_media.sweep, 'interval', seconds=PENDING_SWEEP_SEC,
+                          id="pending_media_sweep", max_instances=1, coalesce=True, replace_existing=True)
+        scheduler.add_job(fsm_storage.sweep, 'interval', seconds=FSM_SWEEP_SEC,
+                          id="fsm_sweep", max_instances=1, coalesce=True, replace_existing=True)
+        scheduler.add_job(reload_classifier, 'interval', seconds=TAGS_RELOAD_SEC,
+                          id="tags_reload", max_instances=1, coalesce=True, replace_existing=True)
+    scheduler.start()
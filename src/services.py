@@ -1,167 +1,107 @@
-import matplotlib.pyplot as plt
-import io
-import pandas as pd
-from sqlalchemy import select, and_
-from datetime import datetime
-from src.database import User, Submission
-
-# ID (Константы)
-ID_NIKITA = 432998089
-ID_DANIA = 818400806
-ID_NYUTA = 510679050
-
-# --- ГРАФИКИ ---
-def generate_period_chart(stats_data: dict, title: str):
-    if not stats_data:
-        fig, ax = plt.subplots(figsize=(6, 4))
-        ax.text(0.5, 0.5, "Нет данных", ha='center')
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plt.close()
-        return buf
-
-    names = list(stats_data.keys())
-    penalties = [d['total_penalty'] for d in stats_data.values()]
-
-    plt.style.use('bmh')
-    fig, ax = plt.subplots(figsize=(8, 5))
-    bars = ax.bar(names, penalties, color=['#4CAF50' if p==0 else '#F44336' for p in penalties], alpha=0.9)
-    
-    ax.set_title(title, fontsize=14, fontweight='bold')
-    ax.set_ylabel("Штрафы", fontsize=12)
-    plt.xticks(rotation=15 if len(names) > 3 else 0)
-
-    for bar in bars:
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width()/2., height, f'{int(height)}',
-                ha='center', va='bottom', fontsize=12, fontweight='bold')
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-    buf.seek(0)
-    plt.close()
-    return buf
+import asyncio
+from typing import TYPE_CHECKING
+from sqlalchemy import select, and_, or_
+from datetime import datetime, timedelta
+from src.database import User, DailyCount, PenaltyRule
+from src.members import members_cache
+from src.identity import identity_cache
+from src.reports import bump_data_version
+from src.penalties import METRICS, evaluate_penalties
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # --- МАТЕМАТИКА ---
+SUBMISSION_TYPES = ["meal", "cheat", "workout", "video_note"]
+
+def period_days(start_date: datetime, end_date: datetime) -> list:
+    """Все календарные дни периода включительно."""
+    first, last = start_date.date(), end_date.date()
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+async def fetch_daily_counts(session, user_ids, start_date: datetime, end_date: datetime) -> list:
+    """Читает сводку daily_counts: не больше юзеры x дни x типы маленьких строк."""
+    stmt = select(DailyCount.user_id, DailyCount.day, DailyCount.type, DailyCount.count).where(
+        and_(DailyCount.user_id.in_(user_ids), DailyCount.day >= start_date.date(), DailyCount.day <= end_date.date())
+    )
+    return (await session.execute(stmt)).all()
+
+def build_counts_table(rows, user_ids, start_date: datetime, end_date: datetime) -> "pd.DataFrame":
+    """Таблица с индексом (user_id, day) по всем дням периода (пустые дни = 0)
+    и колонками по типам + агрегаты meals / cheats / workouts.
+    """
+    import pandas as pd  # Лениво: нужен только отчетам, на старте грузится фоном (main.warm_up)
+    days = period_days(start_date, end_date)
+    index = pd.MultiIndex.from_product([user_ids, days], names=["user_id", "day"])
+
+    if rows:
+        df = pd.DataFrame(rows, columns=["user_id", "day", "type", "n"])
+        table = df.pivot_table(index=["user_id", "day"], columns="type", values="n", aggfunc="sum", fill_value=0)
+    else:
+        table = pd.DataFrame()
+    table = table.reindex(index=index, columns=SUBMISSION_TYPES, fill_value=0).astype(int)
+
+    table["meals"] = table["meal"] + table["cheat"]
+    table["cheats"] = table["cheat"]
+    table["workouts"] = table["workout"] + table["video_note"]
+    return table
+
+def _evaluate(rows, user_ids, start_date, end_date, rules):
+    # CPU-часть отчета (pandas/numpy): идет в потоке, чтобы не держать event loop и другие чаты
+    counts = build_counts_table(rows, user_ids, start_date, end_date)
+    day_labels = [day.strftime("%d.%m") for day in counts.index.levels[1]]
+    matrices = {metric: counts[metric].to_numpy().reshape(len(user_ids), len(day_labels)) for metric in METRICS}
+    return evaluate_penalties(user_ids, day_labels, matrices, rules)
+
+async def fetch_rules(session, chat_id: int, user_ids: list[int]) -> list:
+    """Личные правила юзеров + правила по умолчанию: свои у группы, иначе общие (chat_id NULL)."""
+    rules = (await session.execute(select(PenaltyRule).where(or_(
+        PenaltyRule.user_id.in_(user_ids),
+        and_(PenaltyRule.user_id == None, or_(PenaltyRule.chat_id == chat_id, PenaltyRule.chat_id == None)),
+    )))).scalars().all()
+    if any(rule.user_id is None and rule.chat_id == chat_id for rule in rules):
+        rules = [rule for rule in rules if rule.user_id is not None or rule.chat_id == chat_id]
+    return rules
+
 async def calculate_stats_period(session, bot, chat_id, start_date: datetime, end_date: datetime):
-    start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-    
-    # Обновление имен
-    db_users = (await session.execute(select(User))).scalars().all()
+    """Отчет по локальным дням TIMEZONE с start_date по end_date включительно (время суток не важно).
+
+    Возвращает (stats, complete). complete=False — статус кого-то из участников Telegram не отдал,
+    отчет собран по старым данным: показывать можно, кэшировать и сохранять — нет.
+    """
+
+    # Статусы и имена берем из кэша, промахи запрашиваются параллельно
+    db_users = (await session.execute(select(User).where(User.chat_id == chat_id))).scalars().all()
+    members = await members_cache.resolve(bot, chat_id, [user.tg_id for user in db_users])
+    complete = not any(member.lookup_failed for member in members.values())
     active_users = []
-    
+    renamed = []
+
     for user in db_users:
-        try:
-            member = await bot.get_chat_member(chat_id=chat_id, user_id=user.tg_id)
-            if member.status in ['left', 'kicked']: continue
-            if user.name != member.user.full_name:
-                user.name = member.user.full_name
-                session.add(user)
-            active_users.append(user)
-        except: continue
-    await session.commit()
+        member = members[user.tg_id]
+        if not member.active: continue
+        if member.full_name and user.name != member.full_name:
+            user.name = member.full_name
+            renamed.append(user.tg_id)
+        active_users.append(user)
+
+    if not active_users:
+        return {}, complete
+
+    user_ids = [u.id for u in active_users]
+    rows = await fetch_daily_counts(session, user_ids, start_date, end_date)
+    rules = await fetch_rules(session, chat_id, user_ids)
+    results = await asyncio.to_thread(_evaluate, rows, user_ids, start_date, end_date, rules)
 
     final_stats = {}
-    all_days = pd.date_range(start_date, end_date).to_pydatetime()
-    
-    for user in active_users:
-        user_penalty_sum = 0
-        user_meals_count = 0
-        user_workouts_count = 0
-        penalty_reasons = []
-        
-        subs = (await session.execute(select(Submission).where(
-            and_(Submission.user_id == user.id, Submission.timestamp >= start_date, 
-                 Submission.timestamp <= end_date, Submission.verified == True)
-        ))).scalars().all()
-
-        for day in all_days:
-            d_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-            d_end = day.replace(hour=23, minute=59, second=59, microsecond=999999)
-            day_str = day.strftime("%d.%m")
-            
-            day_subs = [s for s in subs if d_start <= s.timestamp <= d_end]
-            
-            meals = [s for s in day_subs if s.type in ["meal", "cheat"]]
-            cheats = [s for s in day_subs if s.type == "cheat"]
-            workouts = [s for s in day_subs if s.type in ["workout", "video_note"]]
-            
-            user_meals_count += len(meals)
-            user_workouts_count += len(workouts)
-            
-            daily_penalty = 0
-            day_reasons = []
-
-            # 1. НИКИТА
-            if user.tg_id == ID_NIKITA:
-                if len(meals) == 0:
-                    daily_penalty += 1
-                    day_reasons.append("Нет еды")
-                if len(cheats) > 0:
-                    daily_penalty += len(cheats)
-                    day_reasons.append(f"Читы ({len(cheats)})")
-
-            # 2. ДАНЯ
-            elif user.tg_id == ID_DANIA:
-                if len(meals) == 0:
-                    daily_penalty += 1
-                    day_reasons.append("Нет еды")
-                if len(workouts) == 0:
-                    daily_penalty += 1
-                    day_reasons.append("Пропуск зала")
-                if len(cheats) > 0:
-                    daily_penalty += len(cheats)
-                    day_reasons.append(f"Читы ({len(cheats)})")
-
-            # 3. НЮТА
-            elif user.tg_id == ID_NYUTA:
-                # Еда: минимум 3
-                if len(meals) < 3:
-                    daily_penalty += 1
-                    day_reasons.append(f"Мало еды ({len(meals)}/3)")
-                # Зал: Тут НЕ считаем, считаем в конце периода
-            
-            # 4. ОСТАЛЬНЫЕ
-            else:
-                if len(meals) == 0: 
-                    daily_penalty += 1
-                    day_reasons.append("Нет еды")
-                if len(workouts) == 0: 
-                    daily_penalty += 1
-                    day_reasons.append("Нет зала")
-                if len(cheats) > 0:
-                    daily_penalty += len(cheats)
-                    day_reasons.append(f"Читы ({len(cheats)})")
-
-            user_penalty_sum += daily_penalty
-            if day_reasons:
-                penalty_reasons.append(f"{day_str}: {', '.join(day_reasons)}")
-
-        # --- ПОСТ-ОБРАБОТКА ДЛЯ НЮТЫ (ЗАЛ) ---
-        note_text = ""
-        if user.tg_id == ID_NYUTA:
-            # Цель: 12 - 4 = 8 тренировок
-            TARGET_GYM = 8
-            
-            # Сколько не хватает до цели?
-            missing_gym = max(0, TARGET_GYM - user_workouts_count)
-            
-            if missing_gym > 0:
-                user_penalty_sum += missing_gym
-                penalty_reasons.append(f"Зал (Месяц): Осталось сходить {missing_gym} раз(а)")
-            
-            note_text = f" (План: 8/мес. Сделано: {user_workouts_count})"
-
-        reason_str = "\n      └ " + "\n      └ ".join(penalty_reasons) if penalty_reasons else "Нет"
-
-        final_stats[user.name] = {
-            'total_penalty': user_penalty_sum,
-            'total_meals': user_meals_count,
-            'total_workouts': user_workouts_count,
-            'reasons': reason_str,
-            'note': note_text
-        }
-
-    return final_stats
\ No newline at end of file
+    for user, data in zip(active_users, results):
+        penalty_reasons = data.pop('reasons')
+        data['reasons'] = "\n      └ " + "\n      └ ".join(penalty_reasons) if penalty_reasons else "Нет"
+        final_stats[user.name] = data
+
+    if renamed:
+        await session.commit()
+        for tg_id in renamed:
+            identity_cache.invalidate(chat_id, tg_id)
+        bump_data_version()
+    return final_stats, complete
@@ -0,0 +1,102 @@
+"""Процессы-воркеры (SHARD_WORKERS > 0): чаты раскладываются по процессам с общей БД.
+
+Главный процесс только принимает апдейты (polling или вебхук) и кладет их в очередь воркера
+shard_of(chat_scope(чат)): домашняя группа и лички попадают в один процесс, поэтому ожидающие
+медиа, альбомы и кэш участников остаются локальными. Ночные дайджесты и автоудаление
+делает главный процесс, версия данных для кэша отчетов и сброс кэша участников общие,
+лимит Telegram делится поровну. Метрики воркер отдает на своем порту METRICS_PORT + 1 + номер.
+"""
+import asyncio
+import logging
+import multiprocessing
+from aiogram import BaseMiddleware
+from src.config import METRICS_HOST, METRICS_PORT
+from src.chats import chat_scope, shard_of
+from src.reports import share_data_version
+from src.identity import identity_cache
+from src.outbox import outbox, render_outbox_metrics
+from src.metrics import register_collector, start_metrics_server
+
+STOP_TIMEOUT = 30  # Сек на дообработку очереди воркером при остановке
+
+class ShardRouter(BaseMiddleware):
+    """Внешний middleware на dp.update главного процесса: апдейт уходит воркеру, хендлеры не вызываются."""
+
+    def __init__(self, queues: list):
+        self.queues = queues
+
+    async def __call__(self, handler, event, data):
+        chat = data.get("event_chat")
+        index = shard_of(chat_scope(chat.id) if chat else None, len(self.queues))
+        self.queues[index].put(event.model_dump(mode="json", exclude_unset=True, by_alias=True))
+
+class ShardPool:
+    def __init__(self, workers: int):
+        ctx = multiprocessing.get_context("spawn")  # fork после старта asyncio и aiosqlite небезопасен
+        self.version = ctx.Value("q", 0)
+        self.identity_epoch = ctx.Value("q", 0)
+        self.queues = [ctx.Queue() for _ in range(workers)]
+        self.processes = [
+            ctx.Process(target=run_worker, args=(index, queue, self.version, self.identity_epoch, workers + 1), name=f"shard-{index}", daemon=True)
+            for index, queue in enumerate(self.queues)
+        ]
+        self.router = ShardRouter(self.queues)
+
+    def start(self):
+        share_data_version(self.version)
+        identity_cache.share(self.identity_epoch)
+        outbox.share_global_rate(len(self.processes) + 1)  # Воркеры + сам главный процесс
+        for process in self.processes:
+            process.start()
+        logging.info(f"🧩 Запущено воркеров: {len(self.processes)}")
+
+    def stop(self):
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join(STOP_TIMEOUT)
+            if process.is_alive():
+                logging.warning(f"Воркер {process.name} не завершился, останавливаю")
+                process.terminate()
+
+# --- ВОРКЕР ---
+def run_worker(index: int, updates, version, identity_epoch, processes: int):
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(index, updates, version, identity_epoch, processes))
+    except KeyboardInterrupt:
+        pass
+
+async def _serve(index: int, updates, version, identity_epoch, processes: int):
+    from src.main import create_bot, create_dispatcher, startup  # В дочернем процессе, после spawn
+    from src.scheduler import start_scheduler
+    from src.tags import reload_classifier
+    from src.charts import shutdown_chart_pool
+
+    share_data_version(version)
+    identity_cache.share(identity_epoch)
+    outbox.share_global_rate(processes)
+    bot = create_bot()
+    dp = create_dispatcher()
+    await reload_classifier()
+    start_scheduler(bot, shared_jobs=False)
+    metrics = None
+    if METRICS_PORT:
+        # Обработчики, SQL и графики работают здесь: у каждого воркера свой /metrics
+        register_collector(render_outbox_metrics)
+        metrics = await start_metrics_server(METRICS_HOST, METRICS_PORT + 1 + index)
+    startup.mark_ready()
+
+    loop = asyncio.get_running_loop()
+    running = set()
+    logging.info(f"🧩 Воркер {index} готов")
+    try:
+        while (raw := await loop.run_in_executor(None, updates.get)) is not None:
+            task = asyncio.create_task(dp.feed_raw_update(bot, raw))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        await asyncio.gather(*running, return_exceptions=True)
+    finally:
+        if metrics: await metrics.cleanup()
+        shutdown_chart_pool()
+        await bot.session.close()
@@ -0,0 +1,104 @@
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Mapping
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.database import async_session, FsmState
+
+FSM_TTL = 60 * 60        # Брошенное состояние (начал «Кастом (даты)» и ушел) живет час
+FSM_CACHE_SIZE = 1000    # Записей в памяти
+
+@dataclass
+class _Record:
+    state: str | None = None
+    data: dict = field(default_factory=dict)
+    expires_at: datetime | None = None
+
+    def expired(self, now: datetime) -> bool:
+        return self.expires_at is not None and self.expires_at <= now
+
+class SqliteStorage(BaseStorage):
+    """FSM-хранилище в таблице fsm_states с кэшем в памяти.
+
+    Чтение (get_state на каждом апдейте) идет из кэша, в БД — только при промахе.
+    Запись сразу уходит и в кэш, и в БД (write-through). Каждая запись продлевает TTL.
+    """
+
+    def __init__(self, ttl: float = FSM_TTL, cache_size: int = FSM_CACHE_SIZE):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.key_builder = DefaultKeyBuilder(with_destiny=True)
+        self._cache: OrderedDict[str, _Record] = OrderedDict()
+
+    async def _load(self, key: StorageKey) -> tuple[str, _Record]:
+        db_key = self.key_builder.build(key)
+        record = self._cache.get(db_key)
+        if record is None:
+            async with async_session() as session:
+                row = await session.get(FsmState, db_key)
+            record = _Record(row.state, json.loads(row.data), row.expires_at) if row else _Record()
+            self._remember(db_key, record)
+        else:
+            self._cache.move_to_end(db_key)
+
+        if record.expired(datetime.now()):
+            record = _Record()  # Строку из БД удалит sweep
+            self._remember(db_key, record)
+        return db_key, record
+
+    def _remember(self, db_key: str, record: _Record):
+        self._cache[db_key] = record
+        self._cache.move_to_end(db_key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _save(self, db_key: str, record: _Record):
+        async with async_session() as session:
+            if record.state is None and not record.data:
+                await session.execute(delete(FsmState).where(FsmState.key == db_key))
+                record.expires_at = None
+            else:
+                record.expires_at = datetime.now() + timedelta(seconds=self.ttl)
+                values = {"state": record.state, "data": json.dumps(record.data, ensure_ascii=False),
+                          "expires_at": record.expires_at}
+                stmt = sqlite_insert(FsmState).values(key=db_key, **values)
+                await session.execute(stmt.on_conflict_do_update(index_elements=[FsmState.key], set_=values))
+            await session.commit()
+        self._remember(db_key, record)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        db_key, record = await self._load(key)
+        record.state = state.state if isinstance(state, State) else state
+        await self._save(db_key, record)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        _, record = await self._load(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        db_key, record = await self._load(key)
+        record.data = dict(data)
+        await self._save(db_key, record)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, record = await self._load(key)
+        return record.data.copy()
+
+    async def sweep(self) -> int:
+        """Удаляет истекшие состояния из БД и кэша (задача планировщика)."""
+        now = datetime.now()
+        for db_key in [k for k, record in self._cache.items() if record.expired(now)]:
+            del self._cache[db_key]
+        async with async_session() as session:
+            result = await session.execute(delete(FsmState).where(FsmState.expires_at <= now))
+            await session.commit()
+            return result.rowcount
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+fsm_storage = SqliteStorage()
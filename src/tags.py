@@ -0,0 +1,108 @@
+import re
+from sqlalchemy import select
+from src.database import async_session, Tag
+
+CHEAT, WORKOUT, MEAL = "cheat", "workout", "meal"
+# Если в тексте теги нескольких категорий — побеждает та, что левее
+CATEGORY_PRIORITY = (CHEAT, WORKOUT, MEAL)
+
+DEFAULT_TAGS = {
+    WORKOUT: ["#спортзал", "#gym", "#зал", "#workout", "#треня", "#спорт"],
+    MEAL: ["#еда", "#meal", "#food", "#кушать", "#завтрак", "#обед", "#ужин"],
+    CHEAT: ["#читы", "#cheat", "#чит", "#вредное"],
+}
+
+def normalize_tag(tag: str) -> str:
+    tag = tag.strip().lower()
+    if not tag.startswith("#"): tag = "#" + tag
+    if len(tag) < 2 or "#" in tag[1:] or any(ch.isspace() for ch in tag):
+        raise ValueError(f"Некорректный тег: {tag!r}")
+    return tag
+
+class TagClassifier:
+    """Все теги в одной регулярке: категория за один проход по тексту.
+
+    Семантика как у `any(tag in text ...)`: тег может быть частью слова (#спортзалчик).
+    Теги начинаются с '#' и больше его не содержат, поэтому совпадения не перекрываются;
+    самое длинное совпадение в позиции несет категории всех тегов-префиксов (#читы -> #чит).
+    """
+
+    def __init__(self, tags_by_category: dict[str, list[str]]):
+        rank = {category: i for i, category in enumerate(CATEGORY_PRIORITY)}
+        tag_category = {}
+        for category, tags in tags_by_category.items():
+            for tag in tags:
+                tag = normalize_tag(tag)
+                if tag not in tag_category or rank[category] < rank[tag_category[tag]]:
+                    tag_category[tag] = category
+
+        self.tags = tag_category
+        self._rank = rank
+        # Категория совпадения = лучшая среди всех тегов, являющихся его префиксом
+        self._category = {
+            tag: min((c for t, c in tag_category.items() if tag.startswith(t)), key=rank.get)
+            for tag in tag_category
+        }
+        alternation = "|".join(re.escape(tag) for tag in sorted(tag_category, key=len, reverse=True))
+        self._pattern = re.compile(alternation) if alternation else None
+
+    def classify(self, text: str):
+        if not text or "#" not in text or self._pattern is None:
+            return None
+        best = None
+        for match in self._pattern.finditer(text.lower()):
+            category = self._category[match.group()]
+            if category == CATEGORY_PRIORITY[0]:
+                return category
+            if best is None or self._rank[category] < self._rank[best]:
+                best = category
+        return best
+
+classifier = TagClassifier(DEFAULT_TAGS)
+
+def classify(text: str):
+    return classifier.classify(text)
+
+# --- ХРАНЕНИЕ В БД ---
+async def seed_tags():
+    """Заливает стандартные теги, если таблица пустая."""
+    async with async_session() as session:
+        if (await session.execute(select(Tag).limit(1))).first(): return
+        for category, tags in DEFAULT_TAGS.items():
+            for tag in tags:
+                session.add(Tag(tag=normalize_tag(tag), category=category))
+        await session.commit()
+
+async def reload_classifier() -> bool:
+    """Перечитывает теги из БД; пересобирает регулярку только если набор изменился."""
+    global classifier
+    async with async_session() as session:
+        rows = (await session.execute(select(Tag.tag, Tag.category))).all()
+
+    current = {(tag, category) for tag, category in classifier.tags.items()}
+    if set(map(tuple, rows)) == current:
+        return False
+
+    tags_by_category = {}
+    for tag, category in rows:
+        if category in CATEGORY_PRIORITY:
+            tags_by_category.setdefault(category, []).append(tag)
+    classifier = TagClassifier(tags_by_category)
+    return True
+
+async def add_tag(tag: str, category: str):
+    if category not in CATEGORY_PRIORITY:
+        raise ValueError(f"Категория должна быть одной из: {', '.join(CATEGORY_PRIORITY)}")
+    async with async_session() as session:
+        await session.merge(Tag(tag=normalize_tag(tag), category=category))
+        await session.commit()
+    await reload_classifier()
+
+async def remove_tag(tag: str) -> bool:
+    async with async_session() as session:
+        row = await session.get(Tag, normalize_tag(tag))
+        if row is None: return False
+        await session.delete(row)
+        await session.commit()
+    await reload_classifier()
+    return True
@@ -0,0 +1,23 @@
+import asyncio
+from types import SimpleNamespace
+from src.albums import AlbumBuffer, media_item
+
+def _photo(message_id, group, caption=None):
+    return SimpleNamespace(message_id=message_id, media_group_id=group, caption=caption,
+                           photo=[SimpleNamespace(file_id=f"f{message_id}")], video=None, video_note=None)
+
+async def _run():
+    buffer, ready = AlbumBuffer(window=0.05), []
+    async def on_ready(messages): ready.append([m.message_id for m in messages])
+
+    for message in (_photo(3, "a"), _photo(1, "a", "#еда"), _photo(10, "b"), _photo(2, "a")):
+        await buffer.add(message, on_ready)
+    await asyncio.sleep(0.2)
+    return ready, len(buffer)
+
+def test_album_collected_into_one_batch():
+    """Элементы альбома приходят одной пачкой по порядку, разные альбомы — отдельно"""
+    ready, pending = asyncio.run(_run())
+    assert sorted(ready) == [[1, 2, 3], [10]]
+    assert pending == 0
+    assert media_item(_photo(5, "a")) == {"file_id": "f5", "file_type": "photo", "message_id": 5}
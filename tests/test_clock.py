@@ -0,0 +1,15 @@
+from datetime import date, datetime, timezone
+from src.clock import day_bounds, to_epoch, from_epoch
+
+def test_day_bounds_across_dst():
+    """Сутки перехода на летнее/зимнее время в Europe/Kyiv: 23 и 25 часов"""
+    start, end = day_bounds(date(2026, 3, 29), date(2026, 3, 29))
+    assert end - start == 23 * 3600
+    start, end = day_bounds(date(2026, 10, 25), date(2026, 10, 25))
+    assert end - start == 25 * 3600
+
+def test_epoch_is_utc():
+    """Локальное время TIMEZONE <-> UTC epoch не зависит от часов контейнера"""
+    local = datetime(2026, 7, 1, 23, 30)  # Летом Киев = UTC+3
+    assert to_epoch(local) == int(datetime(2026, 7, 1, 20, 30, tzinfo=timezone.utc).timestamp())
+    assert from_epoch(to_epoch(local)) == local
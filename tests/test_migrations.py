@@ -0,0 +1,39 @@
+import sqlite3
+from sqlalchemy import create_engine, inspect
+from src.config import GROUP_CHAT_ID
+from src.database import Base
+from src.migrations import run_migrations, get_version, LATEST_VERSION
+
+# Схема из первой версии бота (до версионных миграций)
+BASELINE_SCHEMA = """
+CREATE TABLE users (id INTEGER NOT NULL PRIMARY KEY, tg_id BIGINT NOT NULL UNIQUE, name VARCHAR NOT NULL, role VARCHAR);
+CREATE TABLE submissions (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER REFERENCES users (id), type VARCHAR,
+                          file_id VARCHAR, file_type VARCHAR, timestamp DATETIME, verified BOOLEAN);
+INSERT INTO users VALUES (1, 111, 'A', 'user'), (2, 222, 'B', 'user');
+INSERT INTO submissions VALUES (1, 1, 'meal', 'f1', 'photo', '2026-03-01 12:00:00.000000', 1),
+                               (2, 1, 'workout', 'f2', 'video', '2026-03-01 18:00:00.000000', 1),
+                               (3, 2, 'meal', 'f3', 'photo', '2026-03-02 09:00:00.000000', 0);
+"""
+
+def _columns(conn, table: str) -> set[str]:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+def test_baseline_db_upgrades_to_latest(tmp_path):
+    """Старая БД доходит до последней версии за один старт"""
+    path = tmp_path / "bot.db"
+    with sqlite3.connect(path) as raw:
+        raw.executescript(BASELINE_SCHEMA)
+
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        run_migrations(conn, Base.metadata)
+    with engine.begin() as conn:
+        run_migrations(conn, Base.metadata)  # Повторный старт ничего не ломает
+        assert get_version(conn) == LATEST_VERSION
+        assert {"chat_id"} <= _columns(conn, "penalty_rules")
+        assert {"ts", "day", "chat_id", "mod_message_id"} <= _columns(conn, "submissions")
+        assert conn.exec_driver_sql("SELECT DISTINCT chat_id FROM users").scalars().all() == [GROUP_CHAT_ID]
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM submission_media").scalar() == 3
+        assert conn.exec_driver_sql("SELECT SUM(count) FROM daily_counts").scalar() == 2
+        assert set(Base.metadata.tables) <= set(inspect(conn).get_table_names())
+    engine.dispose()
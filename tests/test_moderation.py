@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from src.database import Base, User, Submission, SubmissionMedia, DailyCount
+from src.moderation import resolve_user_day
+
+DAY = datetime(2026, 3, 10, 12)
+
+def _submission(user_id: int, sub_type: str, message_id: int, verified: bool = False) -> Submission:
+    return Submission(user_id=user_id, chat_id=-100, type=sub_type, file_id=f"f{message_id}", file_type="photo",
+                      timestamp=DAY, verified=verified, mod_chat_id=1, mod_message_id=message_id)
+
+async def _run():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with session_factory() as session:
+        session.add_all([User(id=1, tg_id=111, name="A", chat_id=-100), User(id=2, tg_id=222, name="B", chat_id=-100)])
+        subs = [
+            _submission(1, "meal", 11), _submission(1, "meal", 12), _submission(1, "workout", 13),
+            _submission(2, "meal", 21), _submission(2, "meal", 22, verified=True),  # Уже принят одиночной кнопкой
+        ]
+        session.add_all(subs)
+        await session.flush()
+        session.add_all(SubmissionMedia(submission_id=sub.id, file_id=sub.file_id, file_type=sub.file_type) for sub in subs)
+        session.add(DailyCount(user_id=2, day=DAY.date(), type="meal", count=1))
+        await session.commit()
+
+        approved = await resolve_user_day(session, 1, DAY.date(), approve=True)
+        rejected = await resolve_user_day(session, 2, DAY.date(), approve=False)
+        again = await resolve_user_day(session, 1, DAY.date(), approve=True)  # Повторный клик: уже нечего менять
+        await session.commit()
+
+        counts = dict(((row.user_id, row.type), row.count) for row in (await session.execute(select(DailyCount))).scalars())
+        left = (await session.execute(select(Submission.mod_message_id).where(Submission.user_id == 2))).scalars().all()
+        media = (await session.execute(select(func.count()).select_from(SubmissionMedia))).scalar()
+    await engine.dispose()
+    return approved, rejected, again, counts, left, media
+
+def test_resolve_user_day():
+    """Принять/отклонить все за день: сводка, сообщения модерации и медиа только у затронутых сабмитов"""
+    approved, rejected, again, counts, left, media = asyncio.run(_run())
+
+    assert sorted(approved) == [(1, 11), (1, 12), (1, 13)]
+    assert rejected == [(1, 21)]
+    assert again == []
+    assert counts == {(1, "meal"): 2, (1, "workout"): 1, (2, "meal"): 1}
+    assert left == [22]
+    assert media == 4  # Медиа отклоненного удалены, принятого — на месте
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from src import outbox as outbox_module
+from src.outbox import SendScheduler, Priority
+
+HOLD = 0.05  # Держим очередь закрытой, пока все запросы не встанут в нее
+
+async def _acquire_all(scheduler, requests):
+    """requests: [(имя, приоритет, метод, чат, target)]. Возвращает [(имя, отпущен ли, когда)]."""
+    start = time.monotonic()
+    done = []
+
+    async def one(name, priority, method, chat_id, target):
+        ok = await scheduler.acquire(priority, method, chat_id, target)
+        done.append((name, ok, time.monotonic() - start))
+
+    scheduler.global_bucket.block(HOLD)
+    await asyncio.gather(*(one(*request) for request in requests))
+    scheduler._task.cancel()
+    return done
+
+def test_priority_order():
+    """Модерация обгоняет обычные ответы, те — отчеты"""
+    done = asyncio.run(_acquire_all(SendScheduler(), [
+        ("bulk", Priority.BULK, "sendPhoto", 1, ()),
+        ("interactive", Priority.INTERACTIVE, "sendMessage", 2, ()),
+        ("moderation", Priority.MODERATION, "answerCallbackQuery", None, ()),
+    ]))
+    assert [name for name, _, _ in done] == ["moderation", "interactive", "bulk"]
+
+def test_chat_throttling(monkeypatch):
+    """Исчерпанный лимит одного чата не задерживает другой; удаления идут мимо лимита чата"""
+    monkeypatch.setattr(outbox_module, "CHAT_RATE", 5.0)
+    monkeypatch.setattr(outbox_module, "CHAT_BURST", 2)
+    done = asyncio.run(_acquire_all(SendScheduler(), [
+        ("a1", Priority.INTERACTIVE, "sendMessage", 1, ()),
+        ("a2", Priority.INTERACTIVE, "sendMessage", 1, ()),
+        ("a3", Priority.INTERACTIVE, "sendMessage", 1, ()),
+        ("a_delete", Priority.BULK, "deleteMessage", 1, (7,)),
+        ("b1", Priority.INTERACTIVE, "sendMessage", 2, ()),
+    ]))
+    order = [name for name, _, _ in done]
+    assert order == ["a1", "a2", "b1", "a_delete", "a3"]
+    assert dict((name, at) for name, _, at in done)["a3"] >= HOLD + 0.15  # Токен чата через 1/5 с
+
+def test_retry_after_blocks_only_that_chat():
+    async def run():
+        scheduler = SendScheduler()
+        scheduler.retry_after(1, 0.2)
+        return await _acquire_all(scheduler, [
+            ("blocked", Priority.INTERACTIVE, "sendMessage", 1, ()),
+            ("other", Priority.INTERACTIVE, "sendMessage", 2, ()),
+        ])
+    done = asyncio.run(run())
+    at = {name: at for name, _, at in done}
+    assert [name for name, _, _ in done] == ["other", "blocked"]
+    assert at["blocked"] >= 0.2 and at["other"] < 0.2
+
+def test_coalescing():
+    """Новая правка тем же методом и удаление выкидывают старые правки; правки разными методами остаются"""
+    done = asyncio.run(_acquire_all(SendScheduler(), [
+        ("caption", Priority.MODERATION, "editMessageCaption", 1, (5,)),
+        ("markup_old", Priority.MODERATION, "editMessageReplyMarkup", 1, (5,)),
+        ("markup_new", Priority.MODERATION, "editMessageReplyMarkup", 1, (5,)),
+        ("other_message", Priority.MODERATION, "editMessageText", 1, (6,)),
+        ("other_delete", Priority.BULK, "deleteMessages", 1, (6, 8)),
+    ]))
+    sent = {name: ok for name, ok, _ in done}
+    assert sent == {"caption": True, "markup_old": False, "markup_new": True,
+                    "other_message": False, "other_delete": True}
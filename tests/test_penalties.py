@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+import numpy as np
+from src.penalties import DAILY_MIN, PER_ITEM, PERIOD_QUOTA, evaluate_penalties
+
+def rule(user_id, kind, metric, value, label=None):
+    return SimpleNamespace(user_id=user_id, kind=kind, metric=metric, value=value, label=label)
+
+def test_daily_rules_and_defaults():
+    """Свои правила у юзера 1, юзер 2 получает правила по умолчанию"""
+    rules = [
+        rule(None, DAILY_MIN, "meals", 1), rule(None, DAILY_MIN, "workouts", 1),
+        rule(1, DAILY_MIN, "meals", 3, "Мало еды ({count}/{value})"), rule(1, PER_ITEM, "cheats", 2),
+    ]
+    matrices = {
+        "meals": np.array([[3, 1], [0, 2]]),
+        "workouts": np.array([[0, 0], [1, 0]]),
+        "cheats": np.array([[1, 0], [0, 0]]),
+    }
+    res = evaluate_penalties([1, 2], ["01.03", "02.03"], matrices, rules)
+
+    assert res[0]['total_penalty'] == 2 + 1
+    assert res[0]['reasons'] == ["01.03: Читы (1)", "02.03: Мало еды (1/3)"]
+    assert res[1]['total_penalty'] == 2
+    assert res[1]['reasons'] == ["01.03: Нет еды", "02.03: Нет зала"]
+    assert res[1]['total_meals'] == 2
+
+def test_daily_min_default_label_uses_value():
+    """Без своего текста минимум больше 1 показывает счет, а не «Нет еды»"""
+    rules = [rule(None, DAILY_MIN, "meals", 3)]
+    matrices = {"meals": np.array([[2, 0]]), "workouts": np.zeros((1, 2)), "cheats": np.zeros((1, 2))}
+    res = evaluate_penalties([1], ["01.03", "02.03"], matrices, rules)
+    assert res[0]['reasons'] == ["01.03: Еда: 2/3", "02.03: Еда: 0/3"]
+
+def test_period_quota():
+    """План на период: штраф за каждую недостающую тренировку"""
+    rules = [rule(7, PERIOD_QUOTA, "workouts", 8)]
+    matrices = {m: np.array([[1, 2, 0]]) for m in ("meals", "workouts", "cheats")}
+    res = evaluate_penalties([7], ["a", "b", "c"], matrices, rules)
+
+    assert res[0]['total_penalty'] == 5
+    assert res[0]['note'] == " (План: 8/мес. Сделано: 3)"
+    assert len(res[0]['reasons']) == 1
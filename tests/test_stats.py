@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from src.database import Base, Submission
+from src.services import calculate_stats_period
+from benchmarks.fakebot import FakeBot
+from benchmarks.synthetic import populate
+
+async def _run():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    end = datetime(2026, 3, 31, 12)
+    start = end - timedelta(days=13)
+    async with session_factory() as session:
+        tg_ids = await populate(session, users=3, years=0.2, end=end, chat_id=-100)
+        bot = FakeBot(left={tg_ids[2]})
+        stats, complete = await calculate_stats_period(session, bot, -100, start, end)
+        assert complete
+        expected_meals = (await session.execute(
+            select(func.count()).where(Submission.verified == True, Submission.type.in_(["meal", "cheat"]),
+                                       Submission.user_id.in_([1, 2]),
+                                       Submission.timestamp >= start.replace(hour=0, minute=0))
+        )).scalar()
+    await engine.dispose()
+    return tg_ids, stats, expected_meals, bot
+
+def test_stats_on_synthetic_history():
+    """Отчет по сводке совпадает с прямым подсчетом по submissions"""
+    tg_ids, stats, expected_meals, bot = asyncio.run(_run())
+
+    assert set(stats) == {f"User {tg_ids[0]}", f"User {tg_ids[1]}"}  # Вышедший из чата не попадает
+    assert sum(d['total_meals'] for d in stats.values()) == expected_meals
+    assert all(d['total_penalty'] >= 0 for d in stats.values())
+    assert bot.count("get_chat_member") == 3
+
+async def _run_unreachable():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    end = datetime(2026, 3, 31, 12)
+    async with session_factory() as session:
+        tg_ids = await populate(session, users=2, years=0.1, end=end, chat_id=-101)
+        bot = FakeBot(members={tg_ids[0]: "Renamed"}, unreachable={tg_ids[1]})
+        stats, complete = await calculate_stats_period(session, bot, -101, end - timedelta(days=6), end)
+        assert not complete  # Такой отчет не кэшируется и не сохраняется
+    await engine.dispose()
+    return tg_ids, stats
+
+def test_stats_keep_member_when_lookup_fails():
+    """Telegram не ответил, а кэш пуст: участник остается в отчете с именем из БД"""
+    tg_ids, stats = asyncio.run(_run_unreachable())
+    assert set(stats) == {"Renamed", f"User {tg_ids[1]}"}
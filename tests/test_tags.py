@@ -0,0 +1,26 @@
+import random
+from src.tags import DEFAULT_TAGS, TagClassifier, CHEAT, WORKOUT, MEAL
+
+def naive_classify(text):
+    """Старая логика из handlers: три прохода any(tag in text)"""
+    text = text.lower()
+    if any(tag in text for tag in DEFAULT_TAGS[CHEAT]): return CHEAT
+    if any(tag in text for tag in DEFAULT_TAGS[WORKOUT]): return WORKOUT
+    if any(tag in text for tag in DEFAULT_TAGS[MEAL]): return MEAL
+    return None
+
+def test_priority_and_prefixes():
+    clf = TagClassifier(DEFAULT_TAGS)
+    assert clf.classify("Обед #ЕДА, потом #зал") == WORKOUT
+    assert clf.classify("#зал и немного #читы") == CHEAT
+    assert clf.classify("#спортзалчик") == WORKOUT
+    assert clf.classify("просто болтаем") is None
+    assert clf.classify(None) is None
+
+def test_matches_naive_logic():
+    clf = TagClassifier(DEFAULT_TAGS)
+    words = ["привет", "как", "дела", "#", "#x", "#че", "#ед"] + [t for tags in DEFAULT_TAGS.values() for t in tags]
+    rnd = random.Random(0)
+    for _ in range(2000):
+        text = "".join(rnd.choice(words) + rnd.choice([" ", "", "!"]) for _ in range(rnd.randint(0, 6)))
+        assert clf.classify(text) == naive_classify(text), text